@@ -9,8 +9,20 @@
 from PyQt6 import QtCore, QtGui, QtWidgets
 from draw import Draw
 from algorithms import *
+from querystats import QueryStats, report
+from time import perf_counter
+from itertools import chain
 
 class Ui_MainForm(object):
+    # Analyze with NumPy engine, pure Python Algorithms otherwise
+    vectorized = True
+    
+    # Method of live analysis, the last one chosen
+    method = "rc"
+    
+    # Polygon containing the last live query point, tested first
+    hover_first = None
+    
     def setupUi(self, MainForm):
         MainForm.setObjectName("MainForm")
         MainForm.resize(1568, 1077)
@@ -74,11 +86,17 @@ class Ui_MainForm(object):
         icon5.addPixmap(QtGui.QPixmap("images/icons/winding.png"), QtGui.QIcon.Mode.Normal, QtGui.QIcon.State.Off)
         self.actionWinding_number.setIcon(icon5)
         self.actionWinding_number.setObjectName("actionWinding_number")
+        self.actionWinding_number_int = QtGui.QAction(parent=MainForm)
+        self.actionWinding_number_int.setIcon(icon5)
+        self.actionWinding_number_int.setObjectName("actionWinding_number_int")
         self.actionRay_crossing = QtGui.QAction(parent=MainForm)
         icon6 = QtGui.QIcon()
         icon6.addPixmap(QtGui.QPixmap("images/icons/ray.png"), QtGui.QIcon.Mode.Normal, QtGui.QIcon.State.Off)
         self.actionRay_crossing.setIcon(icon6)
         self.actionRay_crossing.setObjectName("actionRay_crossing")
+        self.actionLive = QtGui.QAction(parent=MainForm)
+        self.actionLive.setCheckable(True)
+        self.actionLive.setObjectName("actionLive")
         self.menuFile.addAction(self.actionOpen)
         self.menuFile.addSeparator()
         self.menuFile.addAction(self.actionExit)
@@ -87,7 +105,10 @@ class Ui_MainForm(object):
         self.menuInput.addAction(self.actionClear_results)
         self.menuInput.addAction(self.actionClear_all)
         self.menuAnalyze.addAction(self.actionWinding_number)
+        self.menuAnalyze.addAction(self.actionWinding_number_int)
         self.menuAnalyze.addAction(self.actionRay_crossing)
+        self.menuAnalyze.addSeparator()
+        self.menuAnalyze.addAction(self.actionLive)
         self.menubar.addAction(self.menuFile.menuAction())
         self.menubar.addAction(self.menuInput.menuAction())
         self.menubar.addAction(self.menuAnalyze.menuAction())
@@ -97,6 +118,7 @@ class Ui_MainForm(object):
         self.toolBar.addSeparator()
         self.toolBar.addAction(self.actionWinding_number)
         self.toolBar.addAction(self.actionRay_crossing)
+        self.toolBar.addAction(self.actionLive)
         self.toolBar.addSeparator()
         self.toolBar.addAction(self.actionClear_results)
         self.toolBar.addAction(self.actionClear_all)
@@ -108,9 +130,22 @@ class Ui_MainForm(object):
         self.actionExit.triggered.connect(self.exitClick)
         self.actionRay_crossing.triggered.connect(self.rayCrossingClick)
         self.actionWinding_number.triggered.connect(self.windingNumberClick)
+        self.actionWinding_number_int.triggered.connect(self.windingNumberIntClick)
         self.actionPoint_Polygon.triggered.connect(self.switchClick)
         self.actionClear_all.triggered.connect(self.clearAllClick)
         self.actionClear_results.triggered.connect(self.clearClick)
+        self.actionLive.toggled.connect(self.liveClick)
+        self.Canvas.hoverMoved.connect(self.hoverRes)
+        
+        # Loading progress and cancellation in status bar
+        self.cancelButton = QtWidgets.QPushButton(parent=self.statusbar)
+        self.cancelButton.setObjectName("cancelButton")
+        self.cancelButton.hide()
+        self.statusbar.addPermanentWidget(self.cancelButton)
+        self.cancelButton.clicked.connect(self.cancelClick)
+        self.Canvas.loadProgress.connect(self.loadProgress)
+        self.Canvas.loadFinished.connect(self.loadFinished)
+        QtWidgets.QApplication.instance().aboutToQuit.connect(self.Canvas.cancelLoad)
 
         self.retranslateUi(MainForm)
         QtCore.QMetaObject.connectSlotsByName(MainForm)
@@ -133,8 +168,14 @@ class Ui_MainForm(object):
         self.actionClear_all.setToolTip(_translate("MainForm", "Clear all data"))
         self.actionWinding_number.setText(_translate("MainForm", "Winding number"))
         self.actionWinding_number.setToolTip(_translate("MainForm", "Winding number algorithm"))
+        self.actionWinding_number_int.setText(_translate("MainForm", "Integer winding number"))
+        self.actionWinding_number_int.setToolTip(_translate("MainForm", "Winding number algorithm without trigonometry"))
         self.actionRay_crossing.setText(_translate("MainForm", "Ray crossing"))
         self.actionRay_crossing.setToolTip(_translate("MainForm", "Ray crossing algorithm"))
+        self.actionLive.setText(_translate("MainForm", "Live"))
+        self.actionLive.setToolTip(_translate("MainForm", "Analyze polygon under cursor"))
+        self.cancelButton.setText(_translate("MainForm", "Cancel"))
+        self.cancelButton.setToolTip(_translate("MainForm", "Stop loading shapefile"))
 
     def openClick(self):
         self.Canvas.openFile()
@@ -147,6 +188,24 @@ class Ui_MainForm(object):
         
     def clearClick(self):
         self.Canvas.clearRes()
+        
+    def cancelClick(self):
+        self.Canvas.cancelLoad()
+        
+    def liveClick(self, checked):
+        self.hover_first = None
+        self.Canvas.setLive(checked)
+        if not checked:
+            self.statusbar.clearMessage()
+    
+    def loadProgress(self, done, total):
+        # Show loading state in status bar
+        self.cancelButton.show()
+        self.statusbar.showMessage(f"Loading polygons: {done}/{total}")
+        
+    def loadFinished(self):
+        self.cancelButton.hide()
+        self.statusbar.showMessage(f"Loaded {len(self.Canvas.getBounds())} polygons")
    
         
     def getRes(self,method):
@@ -156,27 +215,23 @@ class Ui_MainForm(object):
         
         # Get input data
         q = self.Canvas.getQ()
-        a = Algorithms()
-        result = 0
-        num_pols = 0
-        for pol in self.Canvas.getPol():
-            # Analyze position
-            in_bb = a.in_min_max_box(q, pol)
-            if in_bb == 0:
-                continue
-            
-            if method == "rc":
-                result = a.ray_crossing(q, pol)                
-            if method == "wn":
-                result = a.winding_number(q, pol)
-                
-            if result == -1:
-                self.Canvas.paintRes(pol)
-                num_pols += 1
-            if result == 1:
-                self.Canvas.paintRes(pol) 
-                break    
-    
+        self.method = method
+        stats = QueryStats(method, "vectorized" if self.vectorized else "reference")
+        result, num_pols, hits = self.cachedPolygons(q, method, stats)
+        
+        # Highlight boundary and containing polygons
+        start = perf_counter()
+        for i in hits:
+            self.Canvas.paintRes(i)
+        self.Canvas.paintNow()
+        stats.lap("paint", start)
+        
+        # Report work and time of the query
+        stats.result = result
+        stats.shared = num_pols
+        self.statusbar.showMessage(stats.summary())
+        report(stats)
+        
         # Show results
         dialog = QtWidgets.QMessageBox()
         dialog.setWindowTitle('Analyze point and polygon position')
@@ -199,10 +254,147 @@ class Ui_MainForm(object):
         # Show dialog
         dialog.exec()
         
+    def hoverRes(self, q):
+        """
+        Analyze position of point under cursor, result in status bar
+        """
+        stats = QueryStats(self.method, "vectorized" if self.vectorized else "reference")
+        result, num_pols, hits = self.cachedPolygons(q, self.method, stats, self.hover_first)
+        
+        # Next position is tested against the same polygon first
+        self.hover_first = hits[-1] if result == 1 else None
+        
+        start = perf_counter()
+        self.Canvas.highlight(hits)
+        self.Canvas.paintNow()
+        stats.lap("paint", start)
+        
+        stats.result = result
+        stats.shared = num_pols
+        report(stats)
+        
+        if result == 1:
+            text = f"Inside polygon {hits[-1]}"
+        elif result == -1 and num_pols == 1:
+            text = f"On the boundary of polygon {hits[0]}"
+        elif result == -1:
+            text = f"On the boundary shared by {num_pols} polygons"
+        else:
+            text = "Outside all polygons"
+        self.statusbar.showMessage(f"{text} | {1000 * stats.total():.2f} ms")
+    
+    def cachedPolygons(self, q, method, stats, first=None):
+        # Repeated query is answered from cache until geometry changes
+        stats.points += 1
+        key = self.Canvas.queryKey(q, method, stats.engine)
+        cached = self.Canvas.query_cache.get(key)
+        if cached is not None:
+            stats.cached = True
+            return cached
+        
+        found = self.findPolygons(q, method, stats, first)
+        self.Canvas.query_cache.put(key, found)
+        return found
+    
+    def findPolygons(self, q, method, stats, first=None):
+        """
+        Position of point q, number of polygons sharing it on the boundary
+        and indices of polygons to highlight, polygon first is tested before
+        the other candidates
+        """
+        a = Algorithms()
+        result = 0
+        hits = []
+        
+        # Polygons known to hold q on their boundary
+        known = set()
+        prepared = self.Canvas.getPrepared() if self.vectorized else {}
+        if self.vectorized:
+            # NumPy engine is loaded with the first analysis
+            from vectorized import VectorAlgorithms
+            v = VectorAlgorithms()
+            layer = self.Canvas.getLayer()
+        boxes = self.Canvas.getBounds()
+        topology = self.Canvas.getTopology()
+        
+        # Test only polygons returned by the spatial index
+        start = perf_counter()
+        candidates = self.Canvas.getCandidates(q)
+        stats.polygons = len(candidates)
+        if first is not None and first in candidates:
+            candidates = chain([first], (i for i in candidates if i != first))
+        start = stats.lap("filter", start)
+        for i in candidates:
+            # Boundary of polygon already holds q, it cannot contain it
+            if i in known:
+                continue
+            
+            # Analyze position
+            in_bb = a.in_min_max_box(q, boxes[i])
+            start = stats.lap("filter", start)
+            if in_bb == 0:
+                continue
+            stats.in_box += 1
+            
+            prep = prepared.get(i)
+            if prep is not None and method == "rc":
+                result = prep.ray_crossing((q.x(), q.y()))
+                stats.edges += prep.slab_edges(q.y())
+            elif prep is not None and method == "wi":
+                result = prep.winding_number_int((q.x(), q.y()))
+                stats.edges += prep.slab_edges(q.y())
+            elif self.vectorized:
+                # All rings of polygon in one pass
+                xy, rings = layer.geometry(i)
+                if method == "rc":
+                    result = v.ray_crossing((q.x(), q.y()), xy, rings)
+                if method == "wn":
+                    result = v.winding_number((q.x(), q.y()), xy, rings)
+                if method == "wi":
+                    result = v.winding_number_int((q.x(), q.y()), xy, rings)
+                stats.edges += len(xy)
+            else:
+                rings = self.Canvas.getRings(i)
+                if method == "rc":
+                    result = a.rings_position(q, rings, a.ray_crossing)                
+                if method == "wn":
+                    result = a.rings_position(q, rings, a.winding_number)
+                if method == "wi":
+                    result = a.rings_position(q, rings, a.winding_number_int)
+                stats.edges += sum(len(ring) for ring in rings)
+            start = stats.lap("test", start)
+            
+            if result == -1:
+                # Polygons sharing the vertex or edge are known from topology
+                shared = topology.sharing(i, (q.x(), q.y())) if topology is not None else None
+                for j in (shared.tolist() if shared is not None else [i]):
+                    if j not in known:
+                        known.add(j)
+                        hits.append(j)
+                
+                # On a clean layer no other polygon touches or contains q,
+                # otherwise the other candidates are still tested
+                if shared is not None and topology.clean:
+                    break
+            if result == 1:
+                hits.append(i)
+                break    
+        
+        # Boundary hit is kept even if a later candidate is outside
+        num_pols = len(known)
+        if num_pols > 0 and result != 1:
+            result = -1
+        
+        return result, num_pols, hits
+        
     def windingNumberClick(self):
         # Use winding number algorithm to analyze point and polygon position
         self.getRes("wn")
         
+    def windingNumberIntClick(self):
+        # Use integer winding number algorithm to analyze point and polygon position
+        self.getRes("wi")
+        
     def rayCrossingClick(self):
         # Use ray crossing algorithm to analyze point and polygon position
         self.getRes("rc")
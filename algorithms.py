@@ -1,7 +1,5 @@
-import sys
-from PyQt6.QtCore import *
-from PyQt6.QtGui import *
-from PyQt6.QtWidgets import *
+from PyQt6.QtCore import QPointF
+from PyQt6.QtGui import QPolygonF
 from math import acos,sqrt,pi
 
 class Algorithms:
@@ -76,8 +74,8 @@ class Algorithms:
             if p1x == 0 and p1y == 0:
                 return -1
             
-            # The ray goes trough both vertices of the edge, skip
-            if p2y == 0 and p1y == 0:
+            # Horizontal edge does not cross the ray, skip
+            if p2y == p1y:
                 continue
             
             # Compute intersection x coordinate
@@ -151,24 +149,108 @@ class Algorithms:
         # Point is outside
         return 0 
             
-    def in_min_max_box (self, q:QPointF, pol:QPolygonF):
-        # Checks if a point is inside a min-max box
+    def winding_number_int(self, q:QPointF, pol:QPolygonF):
+        # Analyze point and polygon position using integer winding number
         
-        # Create lists of x and y coordinates
-        xs = [point.x() for point in pol]
-        ys = [point.y() for point in pol]
+        # Initialize signed number of crossings
+        wn = 0
         
-        # Min/max x coordinates
-        x_min = min(xs)
-        x_max = max(xs)
+        # Number of vertices
+        n = len(pol)
+        
+        qx = q.x()
+        qy = q.y()
+        
+        # Process all points
+        for i in range(n):
+            p1 = pol[i]
+            p2 = pol[(i+1)%n]
+            
+            if self.point_on_vertex(q,p1):
+                # Check if point is identical with the vertex
+                return -1
+            
+            # Half-plane test
+            det = self.get_point_location(q,p1,p2)
+            
+            y1 = p1.y()
+            y2 = p2.y()
+            
+            # Point lies on the edge
+            if det == 0 and min(p1.x(), p2.x()) <= qx <= max(p1.x(), p2.x()) and min(y1, y2) <= qy <= max(y1, y2):
+                return -1
+            
+            # Upward edge, point in left half-plane
+            if y1 <= qy:
+                if y2 > qy and det > 0:
+                    wn += 1
+                    
+            # Downward edge, point in right half-plane
+            elif y2 <= qy and det < 0:
+                wn -= 1
+        
+        if wn != 0:
+            # Point is inside
+            return 1
+        # Point is outside
+        return 0
+    
+    def rings_position(self, q:QPointF, rings, test):
+        # Analyze point and polygon with holes or parts, ring by ring
         
-        # Min/max y coordinates
-        y_min = min(ys)
-        y_max = max(ys)
+        # Number of rings containing the point
+        inside = 0
         
-        if q.x() <= x_max and q.x() >= x_min and q.y() <= y_max and q.y() >= y_min:
+        for ring in rings:
+            res = test(q, ring)
+        
+            if res == -1:
+                # Point lies on a ring
+                return -1
+            inside += res
+        
+        # Point inside hole or outside all parts if even
+        return inside % 2
+    
+    def min_max_box(self, pol:QPolygonF):
+        # Computes min-max box of a polygon as (x_min, y_min, x_max, y_max)
+        x_min = y_min = float("inf")
+        x_max = y_max = float("-inf")
+        
+        for point in pol:
+            x = point.x()
+            y = point.y()
+            
+            if x < x_min:
+                x_min = x
+            if x > x_max:
+                x_max = x
+            if y < y_min:
+                y_min = y
+            if y > y_max:
+                y_max = y
+                
+        return (x_min, y_min, x_max, y_max)
+            
+    def in_min_max_box (self, q:QPointF, box):
+        # Checks if a point is inside a precomputed min-max box
+        
+        # Empty polygon has no box
+        if box is None:
+            return 0
+        
+        x_min, y_min, x_max, y_max = box
+        x = q.x()
+        y = q.y()
+        
+        if x <= x_max and x >= x_min and y <= y_max and y >= y_min:
             # Point is inside a min-max box
             return 1
         else:
             # Point is outside a min-max box
-            return 0        
\ No newline at end of file
+            return 0
+
+    def classify_points(self, points, polygons, bounds=None, method="rc", prepared=None):
+        # Classify array of points against polygon arrays in one call
+        from vectorized import VectorAlgorithms
+        return VectorAlgorithms().classify_points(points, polygons, bounds, method, prepared)
@@ -0,0 +1,432 @@
+"""
+Benchmarks of the point and polygon application
+
+Suites:
+
+    startup     time to first window in fresh interpreters, with the heavy
+                modules already loaded by then
+    algorithms  position of a point in convex, star, spiral and comb shaped
+                polygons of 10 to 10^6 vertices, reference Algorithms and
+                NumPy engines
+    layers      index, simplification and queries over layers of 10 to
+                10^5 polygons
+    gui         loading, painting and the full getRes path over the bundled
+                MAP_MESTSKECASTI_P layer
+
+Workloads are generated from a fixed seed. Results are seconds, written as
+JSON and optionally compared with a baseline, the exit code is 1 if any
+result is slower than the baseline by more than the tolerance.
+
+    python benchmark.py algorithms layers --output current.json
+    python benchmark.py --baseline baseline.json --tolerance 0.25
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+SUITES = ["startup", "algorithms", "layers", "gui"]
+
+# Modules that must not be imported before the first Open or analysis
+HEAVY_MODULES = ["numpy", "pandas", "pyarrow", "geopandas", "shapely", "pyogrio"]
+
+# Bundled layer used by gui suite
+LAYER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "MAP_MESTSKECASTI_P_shp", "MAP_MESTSKECASTI_P.shp")
+
+# Script run in child interpreter, prints loaded heavy modules once window is shown
+STARTUP_SCRIPT = """
+import sys
+from PyQt6 import QtWidgets
+import MainForm
+app = QtWidgets.QApplication(sys.argv)
+window = QtWidgets.QMainWindow()
+ui = MainForm.Ui_MainForm()
+MainForm.ui = ui
+ui.setupUi(window)
+window.show()
+app.processEvents()
+print(",".join(m for m in {heavy!r} if m in sys.modules), flush=True)
+"""
+
+
+def measure(fn, repeat, budget=1.0):
+    """
+    Shortest of up to repeat runs of fn, fewer runs once budget seconds are spent
+    """
+    best = float("inf")
+    spent = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        spent += elapsed
+        if spent > budget:
+            break
+    return best
+
+
+def convex(n):
+    # Regular polygon on unit circle
+    import numpy as np
+    t = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    return np.column_stack([np.cos(t), np.sin(t)])
+
+
+def star(n):
+    # Star with alternating outer and inner vertices
+    import numpy as np
+    t = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    r = np.where(np.arange(n) % 2 == 0, 1.0, 0.4)
+    return np.column_stack([r * np.cos(t), r * np.sin(t)])
+
+
+def spiral(n, turns=3):
+    # Band winding around center, outer side out and inner side back
+    import numpy as np
+    m = n // 2
+    t = np.linspace(0, 2 * np.pi * turns, m)
+    r = 0.2 + 0.8 * t / t[-1]
+    w = 0.1 / turns
+    outer = np.column_stack([(r + w) * np.cos(t), (r + w) * np.sin(t)])
+    inner = np.column_stack([(r - w) * np.cos(t), (r - w) * np.sin(t)])[::-1]
+    return np.vstack([outer, inner])
+
+
+def comb(n):
+    # Comb with narrow teeth, highly concave
+    import numpy as np
+    m = max(2, n - 2)
+    x = np.linspace(1, 0, m)
+    y = np.where(np.arange(m) % 2 == 0, 1.0, 0.1)
+    return np.vstack([[[0.0, 0.0], [1.0, 0.0]], np.column_stack([x, y])])
+
+
+SHAPES = {"convex": convex, "star": star, "spiral": spiral, "comb": comb}
+
+
+def rotated(xy, angle=0.1):
+    # Rotate shape so that no edge is exactly horizontal
+    import numpy as np
+    c = np.cos(angle)
+    s = np.sin(angle)
+    return np.ascontiguousarray(xy @ [[c, s], [-s, c]], dtype=np.float64)
+
+
+def startup_time():
+    """
+    Seconds from launching the application until its window is shown
+    """
+    script = STARTUP_SCRIPT.format(heavy=HEAVY_MODULES)
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", script], cwd=here,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    line = proc.stdout.readline()
+    elapsed = time.perf_counter() - start
+    proc.wait()
+
+    if proc.returncode != 0:
+        raise RuntimeError("Application failed to start")
+
+    return elapsed, [m for m in line.strip().split(",") if m]
+
+
+def bench_startup(args, results, info):
+    # Time to first window over repeated cold starts
+    times = []
+    heavy = set()
+    for _ in range(args.repeat):
+        elapsed, loaded = startup_time()
+        times.append(elapsed)
+        heavy.update(loaded)
+
+    results["startup/first_window"] = statistics.median(times)
+    info["startup_heavy_modules"] = sorted(heavy)
+
+
+def bench_algorithms(args, results, info):
+    """
+    Seconds per query point for every shape, size and engine
+    """
+    import numpy as np
+    from PyQt6.QtCore import QPointF
+    from algorithms import Algorithms
+    from vectorized import VectorAlgorithms
+    from prepared import PreparedPolygon
+    from draw import to_polygon
+
+    a = Algorithms()
+    v = VectorAlgorithms()
+    rng = np.random.default_rng(args.seed)
+
+    n = 10
+    while n <= args.max_vertices:
+        for name, shape in SHAPES.items():
+            xy = rotated(shape(n))
+            pol = to_polygon(xy)
+            key = f"algorithms/{name}/{n}"
+
+            # Query points spread over polygon min-max box
+            lo = xy.min(axis=0)
+            hi = xy.max(axis=0)
+            points = lo + (hi - lo) * rng.random((max(1, min(1000, 10**6 // n)), 2))
+            qpoints = [QPointF(x, y) for x, y in points.tolist()]
+
+            # Pure Python reference evaluates fewer points
+            ref = qpoints[:max(1, min(200, 10**4 // n))]
+            for method in ("ray_crossing", "winding_number", "winding_number_int"):
+                test = getattr(a, method)
+                results[f"{key}/reference/{method}"] = measure(lambda: [test(q, pol) for q in ref], args.repeat) / len(ref)
+
+            box = a.min_max_box(pol)
+            results[f"{key}/reference/min_max_box"] = measure(lambda: a.min_max_box(pol), args.repeat)
+            results[f"{key}/reference/in_min_max_box"] = measure(lambda: [a.in_min_max_box(q, box) for q in qpoints], args.repeat) / len(qpoints)
+
+            # NumPy engine, one point at a time as in getRes
+            pairs = [tuple(p) for p in points.tolist()]
+            for method in ("ray_crossing", "winding_number", "winding_number_int"):
+                test = getattr(v, method)
+                results[f"{key}/vectorized/{method}"] = measure(lambda: [test(q, xy) for q in pairs], args.repeat) / len(pairs)
+
+            # Slab decomposition
+            results[f"{key}/prepared/build"] = measure(lambda: PreparedPolygon(xy), args.repeat)
+            prep = PreparedPolygon(xy)
+            for method in ("ray_crossing", "winding_number_int"):
+                test = getattr(prep, method)
+                results[f"{key}/prepared/{method}"] = measure(lambda: [test(q) for q in pairs], args.repeat) / len(pairs)
+
+        n *= 10
+
+    info["max_vertices"] = args.max_vertices
+
+
+def bench_layers(args, results, info):
+    """
+    Seconds for building structures over synthetic layers and per query point
+    """
+    import numpy as np
+    from polygonstore import PolygonStore
+    from spatialindex import GridIndex
+    from simplify import lod_pyramid
+    from vectorized import VectorAlgorithms
+    from sweep import sweep_join
+
+    v = VectorAlgorithms()
+    rng = np.random.default_rng(args.seed)
+    base = rotated(star(16)) * 0.45
+
+    count = 10
+    while count <= args.max_polygons:
+        key = f"layers/{count}"
+
+        # Grid of stars with one unit spacing
+        side = int(np.ceil(np.sqrt(count)))
+        cells = np.arange(count)
+        arrays = [base + (c % side + 0.5, c // side + 0.5) for c in cells]
+
+        results[f"{key}/store"] = measure(lambda: PolygonStore.from_arrays(arrays), args.repeat)
+        layer = PolygonStore.from_arrays(arrays)
+        boxes = [layer.box(i) for i in range(len(layer))]
+
+        results[f"{key}/index"] = measure(lambda: GridIndex(boxes), args.repeat)
+        index = GridIndex(boxes)
+
+        results[f"{key}/lod"] = measure(lambda: lod_pyramid(layer, side), args.repeat)
+
+        points = rng.random((10_000, 2)) * side
+        results[f"{key}/classify_points"] = measure(lambda: v.classify_points(points, layer), args.repeat) / len(points)
+        results[f"{key}/sweep_join"] = measure(lambda: sweep_join(points, layer), args.repeat) / len(points)
+
+        # Candidates from index tested one point at a time as in getRes
+        pairs = [tuple(p) for p in points[:1000].tolist()]
+
+        def query():
+            for q in pairs:
+                for i in index.query(*q):
+                    xy, rings = layer.geometry(i)
+                    if v.ray_crossing(q, xy, rings) == 1:
+                        break
+
+        results[f"{key}/query"] = measure(query, args.repeat) / len(pairs)
+        count *= 10
+
+    info["max_polygons"] = args.max_polygons
+
+
+def bench_gui(args, results, info):
+    """
+    Seconds for loading, painting, panning and getRes over bundled layer
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    import numpy as np
+    from PyQt6 import QtCore, QtWidgets
+    from PyQt6.QtGui import QMouseEvent, QTransform
+    import MainForm
+    from shpreader import ShpReader
+    from geomcache import cache_path
+    import querystats
+    from querystats import QueryStats
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    window = QtWidgets.QMainWindow()
+    ui = MainForm.Ui_MainForm()
+    MainForm.ui = ui
+    ui.setupUi(window)
+    window.resize(1000, 800)
+    window.show()
+    app.processEvents()
+    canvas = ui.Canvas
+
+    def load(cold=True):
+        # Cold load converts the shapefile, otherwise its cache is read
+        if cold and os.path.exists(cache_path(LAYER)):
+            os.remove(cache_path(LAYER))
+        canvas.shp = ShpReader(LAYER)
+        canvas.geomShapefile()
+        while canvas.loader is not None:
+            app.processEvents()
+            time.sleep(0.001)
+
+    def paint():
+        canvas.invalidate()
+        canvas.repaint()
+
+    def pan():
+        for dx in (5, -5):
+            canvas.view = canvas.view * QTransform.fromTranslate(dx, 0)
+            canvas.scrollBase(dx, 0)
+            canvas.repaint()
+
+    # Collect statistics of every query
+    queries = []
+    querystats.hooks.append(queries.append)
+
+    # Result dialogs are not shown and status prints are dropped
+    exec_dialog = QtWidgets.QMessageBox.exec
+    QtWidgets.QMessageBox.exec = lambda self: 0
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            results["gui/load"] = measure(load, args.repeat)
+            results["gui/load/cached"] = measure(lambda: load(cold=False), args.repeat)
+            paint()
+            results["gui/paint"] = measure(paint, args.repeat)
+            results["gui/pan"] = measure(pan, args.repeat) / 2
+
+            # Click query points into the canvas
+            canvas.switchInput()
+            rng = np.random.default_rng(args.seed)
+            clicks = rng.random((200, 2)) * (canvas.width(), canvas.height())
+
+            def click(x, y):
+                pos = QtCore.QPointF(x, y)
+                canvas.mousePressEvent(QMouseEvent(QtCore.QEvent.Type.MouseButtonPress, pos, pos,
+                                                   QtCore.Qt.MouseButton.LeftButton, QtCore.Qt.MouseButton.LeftButton,
+                                                   QtCore.Qt.KeyboardModifier.NoModifier))
+
+            for vectorized in (True, False):
+                ui.vectorized = vectorized
+                engine = "vectorized" if vectorized else "reference"
+                for method in ("rc", "wn", "wi"):
+                    def analyze(cold=True):
+                        queries.clear()
+                        if cold:
+                            canvas.query_cache.clear()
+                        for x, y in clicks.tolist():
+                            click(x, y)
+                            ui.getRes(method)
+                            canvas.clearRes()
+
+                    key = f"gui/getRes/{engine}/{method}"
+                    results[key] = measure(analyze, args.repeat) / len(clicks)
+
+                    # Stages and work of the last run, reported by getRes
+                    for stage in QueryStats.STAGES:
+                        results[f"{key}/{stage}"] = sum(s.times[stage] for s in queries) / len(queries)
+                    info[f"{key}/edges"] = sum(s.edges for s in queries) / len(queries)
+                    info[f"{key}/in_box"] = sum(s.in_box for s in queries) / len(queries)
+
+                    # Repeated clicks are answered from query cache
+                    results[f"{key}/cached"] = measure(lambda: analyze(cold=False), args.repeat) / len(clicks)
+    finally:
+        querystats.hooks.remove(queries.append)
+        QtWidgets.QMessageBox.exec = exec_dialog
+        window.close()
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print results slower than baseline by more than tolerance, return their count
+    """
+    regressions = 0
+    for key in sorted(results.keys() & baseline.keys()):
+        old = baseline[key]
+        new = results[key]
+        if old > 0 and new > old * (1 + tolerance):
+            regressions += 1
+            print(f"REGRESSION {key}: {old:.3g} s -> {new:.3g} s ({new / old:.2f}x)", file=sys.stderr)
+
+    missing = len(baseline.keys() - results.keys())
+    print(f"Compared {len(results.keys() & baseline.keys())} results, {regressions} regressions, "
+          f"{missing} baseline results not run", file=sys.stderr)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of point and polygon analysis")
+    parser.add_argument("suites", nargs="*", choices=SUITES, help="suites to run, all by default")
+    parser.add_argument("--output", default=None, help="JSON file for results, standard output by default")
+    parser.add_argument("--baseline", default=None, help="JSON results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown against baseline")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of every measurement, shortest is kept")
+    parser.add_argument("--seed", type=int, default=0, help="seed of synthetic workloads")
+    parser.add_argument("--max-vertices", type=int, default=10**6, help="largest polygon of algorithms suite")
+    parser.add_argument("--max-polygons", type=int, default=10**5, help="largest layer of layers suite")
+    args = parser.parse_args(argv)
+
+    suites = args.suites or SUITES
+    results = {}
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "suites": suites,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+    try:
+        for suite in suites:
+            globals()[f"bench_{suite}"](args, results, info)
+
+        baseline = None
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)["results"]
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
+
+    report = json.dumps({"info": info, "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+    if baseline is not None and compare(results, baseline, args.tolerance) > 0:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
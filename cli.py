@@ -0,0 +1,231 @@
+"""
+Headless point and polygon position analysis
+
+Classifies points from a CSV or Parquet file against a polygon shapefile
+without starting Qt. Points are read in chunks, so memory use does not grow
+with the size of the input.
+
+    python cli.py polygons.shp points.csv result.csv --x lon --y lat
+
+With --sweep every chunk is joined to the layer in one plane sweep and the
+number of polygons sharing each boundary point is written as well. With
+--stats work counters and stage times of every chunk are logged.
+"""
+import argparse
+import logging
+import os
+import sys
+
+import numpy as np
+
+from vectorized import VectorAlgorithms
+from prepared import prepare_polygons
+from shpreader import ShpReader
+from polygonstore import PolygonStore
+from querystats import QueryStats, report
+from sweep import SweepJoin
+
+# Text labels of position codes
+STATUS = {1: "in", 0: "out", -1: "on"}
+
+
+def load_polygons(file_name, id_field=None):
+    """
+    Read shapefile polygons with all their rings as PolygonStore and ids
+    """
+    with ShpReader(file_name) as shp:
+        # Polygon ids from attribute or record number
+        if id_field:
+            ids = shp.attributes([id_field])[id_field]
+        else:
+            ids = list(range(len(shp)))
+
+        records = []
+        kept = []
+        for i in range(len(shp)):
+            rec = shp.record(i)
+
+            # Skip null shapes
+            if rec is None:
+                continue
+
+            records.append(rec)
+            kept.append(ids[i])
+
+    return PolygonStore.from_records(records), np.array(kept, dtype=object)
+
+
+def read_points(file_name, x, y, chunk_size):
+    """
+    Yield chunks of point coordinates as (m, 2) arrays
+    """
+    if os.path.splitext(file_name)[1].lower() in (".parquet", ".pq"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(file_name).iter_batches(batch_size=chunk_size, columns=[x, y]):
+            yield np.column_stack([batch.column(x).to_numpy(), batch.column(y).to_numpy()]).astype(np.float64)
+    else:
+        import pandas as pd
+
+        for chunk in pd.read_csv(file_name, usecols=[x, y], chunksize=chunk_size):
+            yield chunk[[x, y]].to_numpy(dtype=np.float64)
+
+
+class ResultWriter:
+    """
+    Append classified chunks to CSV or Parquet output
+    """
+
+    def __init__(self, file_name, ids=()):
+        self.file_name = file_name
+
+        # Polygon ids of the layer, they give the type of the polygon column
+        self.ids = ids
+        self.parquet = os.path.splitext(file_name)[1].lower() in (".parquet", ".pq")
+        self.writer = None
+        self.first = True
+
+    def write(self, points, ids, status, shared=None):
+        import pandas as pd
+
+        df = pd.DataFrame({
+            "x": points[:, 0],
+            "y": points[:, 1],
+            "polygon": ids,
+            "status": np.array([STATUS[-1], STATUS[0], STATUS[1]])[status.astype(np.int64) + 1],
+        })
+
+        # Number of polygons sharing boundary points
+        if shared is not None:
+            df["shared"] = shared
+
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.file_name, self.schema(shared is not None))
+            self.writer.write_table(pa.Table.from_pandas(df, schema=self.writer.schema, preserve_index=False))
+        else:
+            df.to_csv(self.file_name, mode="w" if self.first else "a", header=self.first, index=False)
+
+        self.first = False
+
+    def schema(self, shared):
+        """
+        Parquet schema of all chunks, chunks without hits have only None ids
+        and would be typed differently
+        """
+        import pyarrow as pa
+
+        polygon = pa.array(self.ids).type
+        if pa.types.is_null(polygon):
+            polygon = pa.int64()
+
+        fields = [("x", pa.float64()), ("y", pa.float64()), ("polygon", polygon), ("status", pa.string())]
+        if shared:
+            fields.append(("shared", pa.int64()))
+        return pa.schema(fields)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def classify_file(shp_file, points_file, out_file, x="x", y="y", method="rc", chunk_size=1_000_000, id_field=None,
+                  workers=1, task_size=100_000, prepare_threshold=1000, sweep=False):
+    """
+    Classify all points of a file and write polygon id and status per point
+
+    Work counters of every chunk are passed to querystats.report.
+    """
+    if sweep and (method != "rc" or workers != 1):
+        raise ValueError("Plane sweep uses ray crossing in one process")
+
+    layer, ids = load_polygons(shp_file, id_field)
+
+    # Join whole chunks in one sweep over the polygon edges, sorted once
+    if sweep:
+        pool = None
+        engine = "sweep"
+        join = SweepJoin(layer)
+
+        def classify(points, stats):
+            return join.join(points, stats)
+
+    # Split chunks across processes if more workers are requested
+    elif workers != 1:
+        from parallel import ParallelClassifier
+
+        pool = ParallelClassifier(layer, None, method, workers, task_size, prepare_threshold)
+        engine = "parallel"
+        classify = pool.classify_points
+    else:
+        pool = None
+        engine = "vectorized"
+        v = VectorAlgorithms()
+        prepared = prepare_polygons(layer, prepare_threshold)
+
+        def classify(points, stats):
+            return v.classify_points(points, layer, None, method, prepared, stats)
+
+    writer = ResultWriter(out_file, ids)
+    total = 0
+    try:
+        for points in read_points(points_file, x, y, chunk_size):
+            stats = QueryStats(method, engine)
+            index, status, *shared = classify(points, stats)
+            report(stats)
+
+            # Outside points get no polygon id
+            pol_ids = np.full(len(points), None, dtype=object)
+            found = index >= 0
+            pol_ids[found] = ids[index[found]]
+            writer.write(points, pol_ids, status, *shared)
+            total += len(points)
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.close()
+
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze point and polygon position without GUI")
+    parser.add_argument("shapefile", help="polygon shapefile")
+    parser.add_argument("points", help="CSV or Parquet file with point coordinates")
+    parser.add_argument("output", help="CSV or Parquet output file")
+    parser.add_argument("--x", default="x", help="column with x coordinates")
+    parser.add_argument("--y", default="y", help="column with y coordinates")
+    parser.add_argument("--method", choices=["rc", "wn", "wi"], default="rc",
+                        help="ray crossing, winding number or integer winding number")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000, help="points read at once")
+    parser.add_argument("--id-field", default=None, help="shapefile attribute used as polygon id")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes, 0 for all cores")
+    parser.add_argument("--task-size", type=int, default=100_000, help="points per worker task")
+    parser.add_argument("--prepare-threshold", type=int, default=1000,
+                        help="vertex count above which polygons are decomposed into slabs")
+    parser.add_argument("--sweep", action="store_true",
+                        help="join each chunk in one plane sweep with ray crossing, adds count of polygons sharing boundary points")
+    parser.add_argument("--stats", action="store_true", help="log work counters and stage times of every chunk")
+    args = parser.parse_args(argv)
+
+    if args.stats:
+        logging.basicConfig(format="%(message)s")
+        logging.getLogger("querystats").setLevel(logging.DEBUG)
+
+    try:
+        total = classify_file(args.shapefile, args.points, args.output, args.x, args.y,
+                              args.method, args.chunk_size, args.id_field, args.workers, args.task_size,
+                              args.prepare_threshold, args.sweep)
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
+
+    print(f"Classified {total} points")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,26 +2,108 @@ from PyQt6.QtCore import *
 from PyQt6.QtGui import *
 from PyQt6.QtGui import QMouseEvent, QPaintEvent
 from PyQt6.QtWidgets import *
-import geopandas as gpd
+from math import isnan, sqrt
+from spatialindex import GridIndex
+from querycache import QueryCache
+
+
+def to_polygon(xy):
+    """
+    QPolygonF with vertices from contiguous buffer of float64 x, y pairs
+    """
+    data = memoryview(xy).cast("B")
+    pol = QPolygonF()
+    
+    # QPointF is stored as two doubles, copy coordinates into its buffer
+    pol.resize(len(data) // 16)
+    if len(data):
+        ptr = pol.data()
+        ptr.setsize(len(data))
+        memoryview(ptr).cast("B")[:] = data
+    return pol
 
 
 class Draw(QWidget):
     
+    # Background loading of polygons done and total
+    loadProgress = pyqtSignal(int, int)
+    loadFinished = pyqtSignal()
+    
+    # Cursor position in source coordinates for live analysis
+    hoverMoved = pyqtSignal(QPointF)
+    
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.__q = None
         self.__pol = QPolygonF()
+        self.__pol_box = None
         self.__add_vertex = True
         
         # Check shapefile loading
         self.shp_loaded = False
+        self.shp = None
+        
+        # Background loader of shapefile geometry
+        self.loader = None
+        
+        # Id of current load, changed when a load starts or is cancelled
+        self.load_id = 0
+        
+        # Polygons with their rings and bounds in one flat buffer
+        self.shp_layer = None
+        
+        # Spatial index over loaded polygons
+        self.shp_index = None
+        
+        # Slab decomposition of polygons with many vertices
+        self.shp_prepared = {}
+        self.prepare_threshold = 1000
         
-        # List of polygons
-        self.shp_polygons = []
+        # Polygons owning shared vertices and edges, built once loaded
+        self.shp_topology = None
+        
+        # Simplified layers for drawing, deviation of every level
+        self.shp_lod = []
+        self.lod_errors = []
+        
+        # Drawn polygons of simplified levels by level and index
+        self.shp_shapes = {}
 
         # Highlighted result pol
         self.highlighted_pol = []
         
+        # Area of highlight changes not painted yet
+        self.__pending = QRegion()
+        
+        # Live analysis of polygon under cursor and its highlighted polygons
+        self.live = False
+        self.hover_hits = []
+        
+        # Last cursor position, queried once per frame
+        self.__hover = None
+        self.hover_timer = QTimer(self)
+        self.hover_timer.setSingleShot(True)
+        self.hover_timer.timeout.connect(self.hoverTimeout)
+        
+        # View transform from source coordinates to widget pixels
+        self.view = QTransform()
+        
+        # Last cursor position while panning
+        self.__pan = None
+        
+        # Cached rendering of polygon layer for current view and size
+        self.__base = None
+        
+        # Version of polygon geometry, changed with every edit or load
+        self.layer_version = 0
+        
+        # Results of point queries by layer version, method and point
+        self.query_cache = QueryCache()
+        
+        # Min-max boxes of layer as float tuples and their layer version
+        self.shp_boxes = []
+        self.boxes_version = -1
+        
         
     def openFile(self):
         """
@@ -32,8 +114,13 @@ class Draw(QWidget):
         if file_name:
             
             try:
-                # Load shp
-                self.shp = gpd.read_file(file_name)
+                # Shapefile reading and NumPy are loaded with the first file
+                from shpreader import ShpReader
+                
+                # Open shp, geometry is decoded in geomShapefile
+                if self.shp is not None:
+                    self.shp.close()
+                self.shp = ShpReader(file_name)
                 
                 # Shp geometry
                 self.geomShapefile()
@@ -43,43 +130,184 @@ class Draw(QWidget):
 
     def geomShapefile(self):
         """
-        Geometry for drawing
+        Geometry for drawing, decoded in background and added in batches
         """
-        self.shp_polygons.clear()
+        self.cancelLoad()
+        self.clearLayer()
         
         # Chatgpt + own line 51 to 74
-        if self.shp is None or self.shp.empty:
+        if self.shp is None or len(self.shp) == 0:
             QMessageBox.critical(None, "Error", "No geometry in shapefile")
             return
 
-        # Find min/max to normalize coordinates
-        min_x, min_y, max_x, max_y = self.shp.total_bounds
+        # Empty index over extent from shapefile header, filled by batches
+        self.shp_index = GridIndex([], extent=self.shp.bounds, capacity=len(self.shp))
+        self.shp_loaded = True
+        
+        # Show whole layer
+        self.fitView(self.shp.bounds)
+        
+        # Layer converted by an earlier load of the same file
+        from geomcache import load_layer
+        from prepared import prepare_polygons
+        cached = load_layer(self.shp.file_name, self.shp_index)
+        if cached is not None:
+            self.shp_layer, self.lod_errors, self.shp_lod, self.shp_topology = cached
+            self.shp_prepared = prepare_polygons(self.shp_layer, self.prepare_threshold)
+            self.geometryChanged()
+            self.invalidate()
+            self.loadFinished.emit()
+            return
+        
+        self.loadProgress.emit(0, len(self.shp))
+        from loader import ShapefileLoader
+        self.load_id += 1
+        self.loader = ShapefileLoader(self.shp.file_name, self.shp.bounds, self.prepare_threshold, load_id=self.load_id)
+        self.loader.batchReady.connect(self.addBatch)
+        self.loader.topologyReady.connect(self.setTopology)
+        self.loader.progress.connect(self.loadStep)
+        self.loader.failed.connect(self.loadFailed)
+        self.loader.finished.connect(self.loadDone)
+        self.loader.start()
 
-        width = self.width()
-        height = self.height()
+    def addBatch(self, batch, load_id):
+        """
+        Append polygons decoded by loader, queryable once indexed
+        """
+        # Ignore batches of cancelled loader, they may still be queued
+        if load_id != self.load_id or self.loader is None:
+            return
         
-        for geom in self.shp.geometry:
-            if geom.geom_type == "Polygon":                
-                pol = QPolygonF([QPointF((float(x) - min_x) / (max_x - min_x) * width,
-                    height - (float(y) - min_y) / (max_y - min_y) * height
-                    )
-                    for x, y in geom.exterior.coords
-                ])
-                
-                self.shp_polygons.append(pol)
-                        
-            else:
-                print(f"Geometry: {str(geom.geom_type)}")
-                QMessageBox.critical(None, "Error", f"Shapefile contains: {str(geom.geom_type)}")
-                break
+        # Levels of detail
+        self.lod_errors = batch.lod_errors
+        if self.shp_layer is None:
+            self.shp_layer = batch.layer
+            self.shp_lod = batch.lod
+            added = range(len(batch.layer))
+        else:
+            added = self.shp_layer.extend(batch.layer)
+            for level, pols in zip(self.shp_lod, batch.lod):
+                level.extend(pols)
+        
+        for box in batch.layer.bounds.tolist():
+            self.shp_index.insert(tuple(box))
+        for i, prep in batch.prepared.items():
+            self.shp_prepared[added.start + i] = prep
+        self.geometryChanged()
+        
+        # New polygons lie on top of the cached ones, draw just them
+        if self.__base is None:
+            self.invalidate()
+        else:
+            self.paintBase(indices=added)
+            self.update()
 
-        self.shp_loaded = True
-        self.repaint()
+    def setTopology(self, topology, load_id):
+        # Topology of all polygons loaded by current loader
+        if load_id == self.load_id and self.loader is not None:
+            # Same polygons as the loader copy, which is released with it
+            topology.layer = self.shp_layer
+            self.shp_topology = topology
+    
+    def loadStep(self, done, total, load_id):
+        # Progress of current loader
+        if load_id == self.load_id and self.loader is not None:
+            self.loadProgress.emit(done, total)
+    
+    def loadFailed(self, message, load_id):
+        # Unsupported geometry, polygons loaded so far are kept
+        if load_id != self.load_id or self.loader is None:
+            return
+        print(f"Geometry: {message}")
+        QMessageBox.critical(None, "Error", message)
+
+    def loadDone(self):
+        # Loader thread finished or was cancelled
+        if self.loader is not None and self.sender() is self.loader:
+            if self.loader.complete and self.shp_layer is not None:
+                self.saveCache()
+            self.loader = None
+            self.loadFinished.emit()
+    
+    def saveCache(self):
+        # Keep converted layer for the next load of the same file
+        from geomcache import save_layer
+        try:
+            save_layer(self.shp.file_name, self.shp_layer, self.lod_errors, self.shp_lod, self.shp_index, self.shp_topology)
+        except (OSError, ValueError) as e:
+            print(f"Geometry cache: {str(e)}")
+
+    def cancelLoad(self):
+        """
+        Stop background loading, polygons loaded so far are kept
+        """
+        if self.loader is not None:
+            loader = self.loader
+            self.loader = None
+            
+            # Signals still queued by the loader are ignored
+            self.load_id += 1
+            loader.requestInterruption()
+            loader.wait()
+            self.loadFinished.emit()
+
+    def clearLayer(self):
+        # Drop loaded polygons and structures built over them
+        self.shp_layer = None
+        self.shp_index = None
+        self.shp_prepared = {}
+        self.shp_topology = None
+        self.shp_lod = []
+        self.lod_errors = []
+        self.shp_shapes = {}
+        self.geometryChanged()
+    
+    def geometryChanged(self):
+        # New layer version, cached query results are stale
+        self.layer_version += 1
+        self.query_cache.clear()
+
+    def fitView(self, extent=None):
+        """
+        Fit loaded polygons or given extent into widget
+        """
+        boxes = [box for box in self.getBounds() if box is not None]
+        if extent is None and not boxes:
+            self.view = QTransform()
+            self.invalidate()
+            return
+        
+        # Extent of all polygons
+        if extent is None:
+            extent = (min(box[0] for box in boxes), min(box[1] for box in boxes),
+                      max(box[2] for box in boxes), max(box[3] for box in boxes))
+        x_min, y_min, x_max, y_max = extent
+        
+        # Same scale in both axes, y axis points up in source coordinates
+        dx = x_max - x_min
+        dy = y_max - y_min
+        scale = min(self.width() / dx if dx > 0 else 1, self.height() / dy if dy > 0 else 1)
+        cx = (x_min + x_max) / 2
+        cy = (y_min + y_max) / 2
+        
+        self.view = QTransform(scale, 0, 0, -scale, self.width() / 2 - scale * cx, self.height() / 2 + scale * cy)
+        self.invalidate()
+
+    def toWorld(self, p):
+        # Map widget position to source coordinates
+        return self.view.inverted()[0].map(p)
+
+    def lodLevel(self):
+        # Coarsest level still accurate to one pixel at current view
+        from simplify import lod_level
+        pixel = 1 / sqrt(abs(self.view.determinant()))
+        return lod_level(self.lod_errors, pixel)
 
     def exit(self):
         """
         Exit GUI
         """
+        self.cancelLoad()
         QApplication.instance().quit()
     
     def clearAll(self):
@@ -87,92 +315,353 @@ class Draw(QWidget):
         Clear polygon and point
         """
         if self.shp_loaded:
-            self.shp_polygons.clear()
+            self.cancelLoad()
+            self.clearLayer()
         else:
             self.__pol.clear()
+            self.__pol_box = None
+            self.geometryChanged()
             
         self.__q = None
         self.shp_loaded = False
         self.highlighted_pol = []
-        self.repaint()
+        self.hover_hits = []
+        self.view = QTransform()
+        self.invalidate()
         print("All Clear")
     
     def clearRes(self):
         """
         Clear point
         """
+        dirty = self.overlayRect()
         self.__q = None
         self.highlighted_pol = []
-        self.repaint()
+        self.hover_hits = []
+        self.update(dirty)
         print("Clear")
 
     def mousePressEvent(self, e:QMouseEvent):
+        # Pan view with right or middle button
+        if e.button() != Qt.MouseButton.LeftButton:
+            self.__pan = e.position()
+            return
+        
+        # Area of previous highlights and point
+        dirty = self.overlayRect()
+        
         # Reset highlighted polygons
         self.highlighted_pol = []
+        self.hover_hits = []
         
-        # Get coordinates x,y
-        x = e.position().x()
-        y = e.position().y()
+        # Get coordinates x,y in source coordinates
+        p = self.toWorld(e.position())
+        x = p.x()
+        y = p.y()
         
         # Add polygon vertex
         if self.__add_vertex:
-            
-            # Create new point
-            p = QPointF(x, y)
         
             # Add to point to polygon
             self.__pol.append(p)
+            
+            # Extend min-max box by the new vertex
+            if self.__pol_box is None:
+                self.__pol_box = (x, y, x, y)
+            else:
+                x_min, y_min, x_max, y_max = self.__pol_box
+                self.__pol_box = (min(x_min, x), min(y_min, y), max(x_max, x), max(y_max, y))
+            
+            # Polygon changed
+            self.geometryChanged()
+            self.invalidate()
         
         # Change q coordinates
         else:
             self.__q = QPointF(x, y)
+            
+            # Repaint old and new point only
+            self.update(dirty.united(self.overlayRect()))
+    
+    def mouseMoveEvent(self, e:QMouseEvent):
+        # Shift view by cursor movement
+        if self.__pan is not None:
+            # Whole pixels keep cached layer sharp
+            dx = round(e.position().x() - self.__pan.x())
+            dy = round(e.position().y() - self.__pan.y())
+            if dx == 0 and dy == 0:
+                return
+            
+            self.__pan = self.__pan + QPointF(dx, dy)
+            self.view = self.view * QTransform.fromTranslate(dx, dy)
+            self.scrollBase(dx, dy)
+            self.update()
         
-        # Repaint screen
-        self.repaint()
+        # Query polygon under cursor at most once per frame, positions
+        # arriving meanwhile replace the pending one
+        elif self.live:
+            self.__hover = e.position()
+            if not self.hover_timer.isActive():
+                self.hover_timer.start(self.frameInterval())
+    
+    def setLive(self, live):
+        # Start or stop live analysis under cursor
+        self.live = live
+        self.setMouseTracking(live)
+        if not live:
+            self.hover_timer.stop()
+            self.__hover = None
+            self.highlight([])
+    
+    def frameInterval(self):
+        # Milliseconds between display refreshes
+        screen = self.screen()
+        rate = screen.refreshRate() if screen is not None else 0
+        return max(1, round(1000 / (rate or 60)))
+    
+    def hoverTimeout(self):
+        # Newest cursor position is analyzed
+        if self.live and self.__hover is not None:
+            self.hoverMoved.emit(self.toWorld(self.__hover))
+    
+    def highlight(self, indices):
+        """
+        Replace highlighted polygons, repaint only when they change
+        """
+        if indices == self.hover_hits:
+            return
+        
+        dirty = self.overlayRect()
+        self.highlighted_pol = []
+        for i in indices:
+            self.paintRes(i)
+        self.hover_hits = indices
+        self.__pending += dirty
+        self.update(dirty)
+    
+    def mouseReleaseEvent(self, e:QMouseEvent):
+        # Stop panning
+        if e.button() != Qt.MouseButton.LeftButton:
+            self.__pan = None
+    
+    def wheelEvent(self, e:QWheelEvent):
+        # Zoom view around cursor position
+        f = 1.25 ** (e.angleDelta().y() / 120)
+        p = e.position()
+        self.view = self.view * QTransform.fromTranslate(-p.x(), -p.y()) * QTransform.fromScale(f, f) * QTransform.fromTranslate(p.x(), p.y())
+        self.invalidate()
+    
+    def resizeEvent(self, e:QResizeEvent):
+        # Cached layer no longer covers widget
+        self.__base = None
+        super().resizeEvent(e)
+    
+    def invalidate(self):
+        # Drop cached layer after geometry or view change and schedule repaint
+        self.__base = None
+        self.update()
  
  
-    def paintEvent(self, e:QPaintEvent):
-        # Create new graphic object
-        qp = QPainter(self)
+    def newBase(self):
+        # Empty pixmap covering widget
+        ratio = self.devicePixelRatioF()
+        base = QPixmap(self.size() * ratio)
+        base.setDevicePixelRatio(ratio)
+        base.fill(Qt.GlobalColor.transparent)
+        return base
+    
+    def scrollBase(self, dx, dy):
+        """
+        Shift cached layer by panning and render only exposed strips
+        """
+        if self.__base is None:
+            return
         
-        # Start draw
-        qp.begin(self)
-
+        old = self.__base
+        self.__base = self.newBase()
+        qp = QPainter(self.__base)
+        qp.drawPixmap(dx, dy, old)
+        qp.end()
+        
+        # Strips uncovered by the shift
+        w = self.width()
+        h = self.height()
+        if dx > 0:
+            self.paintBase(QRect(0, 0, dx, h))
+        elif dx < 0:
+            self.paintBase(QRect(w + dx, 0, -dx, h))
+        if dy > 0:
+            self.paintBase(QRect(0, 0, w, dy))
+        elif dy < 0:
+            self.paintBase(QRect(0, h + dy, w, -dy))
+ 
+    def paintBase(self, rect=None, indices=None):
+        """
+        Render polygons intersecting rect of widget into cached pixmap,
+        only those listed in indices when given
+        """
+        if self.__base is None:
+            self.__base = self.newBase()
+        if rect is None:
+            rect = self.rect()
+        
+        qp = QPainter(self.__base)
+        qp.setClipRect(rect)
+        
+        # Draw geometry in source coordinates, pen widths stay in pixels
+        qp.setTransform(self.view)
         
         if self.shp_loaded:
-            qp.setPen(QPen(Qt.GlobalColor.black, 2))
+            qp.setPen(self.pen(2))
             qp.setBrush(Qt.GlobalColor.lightGray)
-            # Draw polygon
-            for pol in self.shp_polygons:
-                qp.drawPolygon(pol)        
+            
+            # Polygons reaching into rect, with margin for pen width
+            world = self.view.inverted()[0].mapRect(QRectF(rect.adjusted(-2, -2, 2, 2)))
+            
+            # Nothing to draw until first batch arrives
+            if self.shp_layer is not None:
+                if indices is None:
+                    indices = self.shp_index.query_box(world.left(), world.top(), world.right(), world.bottom())
+                
+                # Draw polygons simplified for current scale
+                for shape in self.shapes(self.lodLevel(), indices):
+                    self.drawShape(qp, shape)
             
         else:
             # Set graphic attributes, polygon
-            qp.setPen(Qt.GlobalColor.black)
+            qp.setPen(self.pen(1))
             qp.setBrush(Qt.GlobalColor.yellow)
             # Draw polygon
             qp.drawPolygon(self.__pol)
         
+        qp.end()
+ 
+    def paintEvent(self, e:QPaintEvent):
+        # Render polygon layer only after geometry or view change
+        if self.__base is None:
+            self.paintBase()
+        
+        # Create new graphic object
+        qp = QPainter(self)
+        
+        # Draw exposed part of cached layer
+        rect = e.rect()
+        ratio = self.__base.devicePixelRatio()
+        qp.drawPixmap(QRectF(rect), self.__base, QRectF(rect.x() * ratio, rect.y() * ratio, rect.width() * ratio, rect.height() * ratio))
+        
+        # Highlights in source coordinates
+        qp.setTransform(self.view)
+        
         if self.highlighted_pol:
-            qp.setPen(QPen(Qt.GlobalColor.black, 2))
+            qp.setPen(self.pen(2))
             qp.setBrush(Qt.GlobalColor.cyan)
             for hl_pol in self.highlighted_pol:
-                qp.drawPolygon(hl_pol)
+                # Skip highlights outside exposed area
+                if self.polRect(hl_pol).intersects(rect):
+                    self.drawShape(qp, hl_pol)
         
         if self.__q != None:
+            # Point keeps its size in pixels
+            qp.resetTransform()
+            q = self.view.map(self.__q)
+            
             # Set graphic attributes, point
             qp.setPen(Qt.GlobalColor.black)
             qp.setBrush(Qt.GlobalColor.red)
             # Draw point
             r = 10
-            qp.drawEllipse(int(self.__q.x()-r), int(self.__q.y()-r), 2*r, 2*r)
+            qp.drawEllipse(int(q.x()-r), int(q.y()-r), 2*r, 2*r)
         
         # End drawing
         qp.end()
         
-    def paintRes(self, pol):
+    def pen(self, width):
+        # Black pen of width in pixels independent of zoom
+        pen = QPen(Qt.GlobalColor.black, width)
+        pen.setCosmetic(True)
+        return pen
+        
+    def shapes(self, level, indices):
+        """
+        Yield polygons at indices from level of detail, -1 for full resolution,
+        rings of holes and parts as subpaths
+        """
+        layer = self.shp_layer if level < 0 else self.shp_lod[level]
+        
+        # Simplified levels are small, keep what was converted once
+        cache = self.shp_shapes.setdefault(level, {}) if level >= 0 else {}
+        
+        # Ring slices are cut from raw coordinate bytes, 16 per vertex
+        coords = memoryview(layer.coords).cast("B")
+        rings = layer.ring_offsets
+        geoms = layer.geom_offsets
+        
+        for i in indices:
+            shape = cache.get(i)
+            if shape is not None:
+                yield shape
+                continue
+            
+            r0 = int(geoms[i])
+            r1 = int(geoms[i + 1])
+            if r1 - r0 == 1:
+                shape = to_polygon(coords[16 * int(rings[r0]):16 * int(rings[r1])])
+            else:
+                # Holes are left unfilled by odd-even rule
+                shape = QPainterPath()
+                shape.setFillRule(Qt.FillRule.OddEvenFill)
+                for r in range(r0, r1):
+                    shape.addPolygon(to_polygon(coords[16 * int(rings[r]):16 * int(rings[r + 1])]))
+                    shape.closeSubpath()
+            
+            if level >= 0:
+                cache[i] = shape
+            yield shape
+    
+    def drawShape(self, qp, shape):
+        # Draw polygon or path of polygon with holes
+        if isinstance(shape, QPainterPath):
+            qp.drawPath(shape)
+        else:
+            qp.drawPolygon(shape)
+    
+    def polRect(self, pol):
+        # Widget area covered by polygon in source coordinates, with pen margin
+        return self.view.mapRect(pol.boundingRect()).toAlignedRect().adjusted(-2, -2, 2, 2)
+    
+    def pointRect(self):
+        # Widget area covered by query point
+        if self.__q is None:
+            return QRect()
+        q = self.view.map(self.__q)
+        return QRect(int(q.x()) - 12, int(q.y()) - 12, 24, 24)
+    
+    def overlayRect(self):
+        # Widget area covered by highlights and query point
+        rect = self.pointRect()
+        for pol in self.highlighted_pol:
+            rect = rect.united(self.polRect(pol))
+        return rect
+        
+    def paintRes(self, i):
+        # Highlight polygon i at full resolution
+        if self.shp_loaded:
+            pol = next(self.shapes(-1, [i]))
+        else:
+            pol = self.__pol
         self.highlighted_pol.append(pol)
-        self.repaint()
+        
+        # Repaint highlighted area only
+        rect = self.polRect(pol)
+        self.__pending += rect
+        self.update(rect)
+    
+    def paintNow(self):
+        # Paint pending highlight changes at once, so that redraw is timed
+        # with the query instead of later in the event loop
+        if not self.__pending.isEmpty():
+            self.repaint(self.__pending)
+            self.__pending = QRegion()
     
     def switchInput(self):
         # Input point or polygon vertex
@@ -182,9 +671,60 @@ class Draw(QWidget):
         # Get point
         return self.__q
     
-    def getPol(self):
-        # Get polygon
+    def queryKey(self, q, method, engine):
+        """
+        Cache key of query at point q, quantized to a quarter of pixel
+        """
+        scale = 4 * sqrt(abs(self.view.determinant())) or 1.0
+        return (self.layer_version, method, engine, round(q.x() * scale), round(q.y() * scale))
+    
+    def getCandidates(self, q):
+        # Get indices of polygons possibly containing point q
+        if self.shp_loaded and self.shp_index is not None:
+            return self.shp_index.query(q.x(), q.y())
+        else:
+            return range(1)
+    
+    def getRings(self, i):
+        # Get rings of polygon i
+        if self.shp_loaded:
+            return [to_polygon(ring) for ring in self.shp_layer.rings(i)]
+        else:
+            return [self.__pol]
+    
+    def getLayer(self):
+        # Get polygons in flat coordinate buffer with ring offsets
+        from polygonstore import PolygonStore
+        if self.shp_loaded:
+            return self.shp_layer if self.shp_layer is not None else PolygonStore()
+        else:
+            from vectorized import VectorAlgorithms
+            return PolygonStore.from_arrays([VectorAlgorithms().polygon_to_array(self.__pol)])
+    
+    def getPrepared(self):
+        # Get prepared polygons by index
+        if self.shp_loaded:
+            return self.shp_prepared
+        else:
+            return {}
+    
+    def getTopology(self):
+        # Get shared vertex and edge index, None until layer is loaded
         if self.shp_loaded:
-            return self.shp_polygons
+            return self.shp_topology
+        else:
+            return None
+    
+    def getBounds(self):
+        # Get min-max boxes of polygons
+        if self.shp_loaded:
+            if self.shp_layer is None:
+                return []
+            
+            # Plain tuples keep box test free of NumPy scalars
+            if self.boxes_version != self.layer_version:
+                self.shp_boxes = [None if isnan(box[0]) else tuple(box) for box in self.shp_layer.bounds.tolist()]
+                self.boxes_version = self.layer_version
+            return self.shp_boxes
         else:
-            return [self.__pol]
\ No newline at end of file
+            return [self.__pol_box]
\ No newline at end of file
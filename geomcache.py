@@ -0,0 +1,304 @@
+import json
+import mmap
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from polygonstore import PolygonStore
+from topology import TopologyIndex
+
+
+# File start, followed by the header with the version
+MAGIC = b"PIPGEOMC"
+VERSION = 3
+
+# Magic, header length and header CRC32
+PREFIX = struct.Struct("<8sII")
+
+# Arrays start at multiples of ALIGN bytes
+ALIGN = 64
+
+# Only plain numeric arrays are stored
+DTYPES = ("<f8", "<i8")
+
+
+def cache_path(file_name):
+    # Sidecar cache next to the shapefile
+    return file_name + ".geomcache"
+
+
+def source_key(file_name):
+    # Identity of cached source, any change of size or time invalidates cache
+    st = os.stat(file_name)
+    return {"path": os.path.abspath(file_name), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def write_cache(file_name, arrays, meta=None):
+    """
+    Save arrays converted from file_name to its sidecar cache
+
+    The cache is written to a temporary file and renamed over the old one,
+    so readers never see a partially written cache.
+    """
+    arrays = {name: np.ascontiguousarray(a, dtype=a.dtype.newbyteorder("<")) for name, a in arrays.items()}
+
+    # Array layout after the header, offsets relative to the first array
+    layout = {}
+    pos = 0
+    for name, a in arrays.items():
+        if a.dtype.str not in DTYPES:
+            raise ValueError(f"Unsupported array type: {name} {a.dtype}")
+        layout[name] = {"dtype": a.dtype.str, "shape": list(a.shape), "offset": pos, "nbytes": a.nbytes,
+                        "crc": zlib.crc32(a.data)}
+        pos += -(-a.nbytes // ALIGN) * ALIGN
+
+    header = json.dumps({"version": VERSION, "source": source_key(file_name), "meta": meta or {},
+                         "arrays": layout}).encode()
+    start = -(-(PREFIX.size + len(header)) // ALIGN) * ALIGN
+
+    path = cache_path(file_name)
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(PREFIX.pack(MAGIC, len(header), zlib.crc32(header)))
+            f.write(header)
+            for name, a in arrays.items():
+                f.seek(start + layout[name]["offset"])
+                f.write(a.data)
+            f.truncate(start + pos)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+class GeometryCache:
+    """
+    Arrays of a sidecar cache, memory-mapped and read on access
+
+    Raises ValueError when the cache is corrupt, truncated, of another
+    version or was made from a different state of the source file. CRC32
+    of an array is checked when it is first accessed.
+    """
+
+    def __init__(self, file_name):
+        path = cache_path(file_name)
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < PREFIX.size:
+                raise ValueError("Truncated cache")
+            magic, header_len, crc = PREFIX.unpack(f.read(PREFIX.size))
+            if magic != MAGIC:
+                raise ValueError("Not a geometry cache")
+
+            header = f.read(header_len)
+            if len(header) != header_len or zlib.crc32(header) != crc:
+                raise ValueError("Corrupt cache header")
+            header = json.loads(header)
+
+            if header.get("version") != VERSION:
+                raise ValueError("Cache of another version")
+            if header.get("source") != source_key(file_name):
+                raise ValueError("Stale cache")
+
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.meta = header["meta"]
+        self.arrays = {}
+        self.crcs = {}
+        self.checked = set()
+        start = -(-(PREFIX.size + header_len) // ALIGN) * ALIGN
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"], dtype=np.int64))
+            offset = start + spec["offset"]
+            if spec["dtype"] not in DTYPES or count * dtype.itemsize != spec["nbytes"] or offset + spec["nbytes"] > size:
+                raise ValueError(f"Corrupt cache array: {name}")
+            self.arrays[name] = np.frombuffer(self.mm, dtype=dtype, count=count, offset=offset).reshape(spec["shape"])
+            self.crcs[name] = spec["crc"]
+
+    def __getitem__(self, name):
+        a = self.arrays[name]
+        if name not in self.checked:
+            if zlib.crc32(a.data) != self.crcs[name]:
+                raise ValueError(f"Corrupt cache array: {name}")
+            self.checked.add(name)
+        return a
+
+    def __contains__(self, name):
+        return name in self.arrays
+
+
+def remove_cache(file_name, reason):
+    # Drop invalid cache, it is rebuilt with the next load
+    print(f"Geometry cache: {reason}")
+    try:
+        os.remove(cache_path(file_name))
+    except OSError:
+        pass
+
+
+def read_cache(file_name):
+    """
+    Valid cache of file_name, None if there is none, invalid caches are
+    removed so that they are rebuilt
+    """
+    if not os.path.exists(cache_path(file_name)):
+        return None
+    try:
+        return GeometryCache(file_name)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        remove_cache(file_name, str(e))
+        return None
+
+
+def save_layer(file_name, layer, lod_errors, lod, index, topology):
+    """
+    Cache converted polygons of file_name with their levels of detail,
+    spatial index cells and topology
+    """
+    arrays = {"coords": layer.coords[:layer.ring_offsets[-1]], "ring_offsets": layer.ring_offsets,
+              "geom_offsets": layer.geom_offsets, "bounds": layer.bounds}
+
+    # Levels share geometry offsets and bounds of the layer
+    for k, level in enumerate(lod):
+        arrays[f"lod{k}_coords"] = level.coords
+        arrays[f"lod{k}_ring_offsets"] = level.ring_offsets
+
+    keys, offsets, items = index.cell_lists()
+    arrays["index_keys"] = np.array(keys, dtype=np.int64)
+    arrays["index_offsets"] = np.array(offsets, dtype=np.int64)
+    arrays["index_items"] = np.array(items, dtype=np.int64)
+
+    if topology is not None:
+        for name, a in topology.arrays().items():
+            arrays[f"topology_{name}"] = a
+
+    meta = {"lod_errors": list(lod_errors), "levels": len(lod), "grid": [index.nx, index.ny],
+            "topology": topology is not None, "clean": topology is not None and topology.clean}
+    write_cache(file_name, arrays, meta)
+
+
+def check_offsets(offsets, end):
+    # Offsets start at 0, do not decrease and end at end
+    if offsets.ndim != 1 or len(offsets) == 0 or offsets[0] != 0 or offsets[-1] != end or np.any(np.diff(offsets) < 0):
+        raise ValueError("Corrupt cache offsets")
+
+
+def check_shape(cache, name, shape):
+    # Shape from cache header, array data is not read
+    if cache.arrays[name].shape != shape:
+        raise ValueError(f"Corrupt cache array: {name}")
+
+
+class CachedLevel(PolygonStore):
+    """
+    Level of detail in a geometry cache, its coordinates and ring offsets
+    are read and checked on first use. A corrupt level is replaced by the
+    full resolution layer and the cache is removed.
+    """
+
+    def __init__(self, file_name, cache, k, layer):
+        super().__init__(None, None, layer.geom_offsets, layer.bounds)
+        del self.coords, self.ring_offsets
+        self.file_name = file_name
+        self.cache = cache
+        self.k = k
+        self.layer = layer
+
+    def __getattr__(self, name):
+        if name not in ("coords", "ring_offsets") or "cache" not in self.__dict__:
+            raise AttributeError(name)
+
+        cache = self.__dict__.pop("cache")
+        try:
+            coords = cache[f"lod{self.k}_coords"]
+            ring_offsets = cache[f"lod{self.k}_ring_offsets"]
+            check_offsets(ring_offsets, len(coords))
+        except ValueError as e:
+            remove_cache(self.file_name, str(e))
+            coords = self.layer.coords
+            ring_offsets = self.layer.ring_offsets
+        self.coords = coords
+        self.ring_offsets = ring_offsets
+        return getattr(self, name)
+
+
+def topology_loader(file_name, cache, n, n_geoms):
+    # Topology arrays checked when first needed, None if they are corrupt
+    def load():
+        try:
+            arrays = {name: cache[f"topology_{name}"] for name in TopologyIndex.ARRAYS}
+            for kind in ("vertex", "edge"):
+                ids = arrays[f"{kind}_ids"]
+                offsets = arrays[f"{kind}_offsets"]
+                owners = arrays[f"{kind}_owners"]
+                check_offsets(offsets, len(owners))
+                if np.any((ids < 0) | (ids >= len(offsets) - 1)) or np.any((owners < 0) | (owners >= n_geoms)):
+                    raise ValueError("Corrupt cache topology")
+            return arrays
+        except ValueError as e:
+            remove_cache(file_name, str(e))
+            return None
+    return load
+
+
+def load_layer(file_name, index):
+    """
+    Polygons of file_name from its cache as (layer, lod_errors, lod,
+    topology), cells are loaded into empty index of the same grid. None
+    if there is no valid cache.
+
+    Coordinates, offsets, bounds and index are checked on load. Levels of
+    detail and topology are checked on first use, a corrupt one removes
+    the cache and is replaced by full resolution or left out.
+    """
+    cache = read_cache(file_name)
+    if cache is None:
+        return None
+
+    try:
+        meta = cache.meta
+        coords = cache["coords"]
+        n = len(coords)
+        if coords.shape != (n, 2) or not np.isfinite(coords).all():
+            raise ValueError("Corrupt cache coordinates")
+        check_offsets(cache["ring_offsets"], n)
+        check_offsets(cache["geom_offsets"], len(cache["ring_offsets"]) - 1)
+        n_rings = len(cache["ring_offsets"])
+        n_geoms = len(cache["geom_offsets"]) - 1
+        if cache["bounds"].shape != (n_geoms, 4):
+            raise ValueError("Corrupt cache bounds")
+        layer = PolygonStore(coords, cache["ring_offsets"], cache["geom_offsets"], cache["bounds"])
+
+        lod = []
+        for k in range(meta["levels"]):
+            check_shape(cache, f"lod{k}_coords", (cache.arrays[f"lod{k}_coords"].shape[0], 2))
+            check_shape(cache, f"lod{k}_ring_offsets", (n_rings,))
+            lod.append(CachedLevel(file_name, cache, k, layer))
+
+        if meta["grid"] != [index.nx, index.ny]:
+            raise ValueError("Cache of another index grid")
+        keys = cache["index_keys"]
+        items = cache["index_items"]
+        check_offsets(cache["index_offsets"], len(items))
+        if (len(keys) != len(cache["index_offsets"]) - 1 or np.any(np.diff(keys) <= 0)
+                or np.any((items < 0) | (items >= n_geoms))):
+            raise ValueError("Corrupt cache index")
+
+        topology = None
+        if meta["topology"]:
+            for name in TopologyIndex.ARRAYS:
+                if cache.arrays[f"topology_{name}"].ndim != 1:
+                    raise ValueError("Corrupt cache topology")
+            check_shape(cache, "topology_vertex_ids", (n,))
+            check_shape(cache, "topology_edge_ids", (n,))
+            topology = TopologyIndex.from_arrays(layer, topology_loader(file_name, cache, n, n_geoms), bool(meta["clean"]))
+    except (ValueError, KeyError, TypeError, IndexError) as e:
+        remove_cache(file_name, str(e))
+        return None
+
+    index.load_cells(layer.bounds.tolist(), keys, cache["index_offsets"], items)
+    return layer, meta["lod_errors"], lod, topology
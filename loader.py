@@ -0,0 +1,117 @@
+import time
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from shpreader import ShpReader
+from polygonstore import PolygonStore
+from prepared import prepare_polygons
+from simplify import lod_pyramid
+from topology import TopologyIndex
+
+
+class PolygonBatch:
+    """
+    Polygons decoded by the loader, ready to be appended to the layer
+    """
+
+    def __init__(self, layer):
+        self.layer = layer
+        self.prepared = {}
+        self.lod_errors = []
+        self.lod = []
+
+    def __len__(self):
+        return len(self.layer)
+
+
+class ShapefileLoader(QThread):
+    """
+    Decode shapefile polygons in background thread and stream them in batches
+    """
+
+    # Signals are delivered to the GUI thread through queued connections,
+    # last argument is the load id, signals queued before a load was
+    # cancelled are recognized by it
+    batchReady = pyqtSignal(object, int)
+    topologyReady = pyqtSignal(object, int)
+    progress = pyqtSignal(int, int, int)
+    failed = pyqtSignal(str, int)
+
+    def __init__(self, file_name, extent, prepare_threshold=1000, interval=0.1, load_id=0, parent=None):
+        super().__init__(parent)
+        self.file_name = file_name
+        self.load_id = load_id
+        self.extent = extent
+        self.prepare_threshold = prepare_threshold
+
+        # Seconds between batches
+        self.interval = interval
+
+        # All polygons sent so far, for topology of the whole layer
+        self.layer = PolygonStore()
+
+        # All records were loaded, neither cancelled nor failed
+        self.complete = False
+
+    def run(self):
+        with ShpReader(self.file_name) as shp:
+            n = len(shp)
+            records = []
+            last = time.monotonic()
+
+            for i in range(n):
+                # Stop when cancelled
+                if self.isInterruptionRequested():
+                    return
+
+                try:
+                    # All rings in source coordinates
+                    rec = shp.record(i)
+                except ValueError as e:
+                    self.flush(records)
+                    self.failed.emit(str(e), self.load_id)
+                    self.topologyReady.emit(TopologyIndex(self.layer), self.load_id)
+                    return
+
+                # Skip null shapes
+                if rec is None:
+                    continue
+
+                records.append(rec)
+
+                # Hand over polygons decoded so far
+                if time.monotonic() - last > self.interval:
+                    self.flush(records)
+                    self.progress.emit(i + 1, n, self.load_id)
+                    records = []
+                    last = time.monotonic()
+
+            self.flush(records)
+            self.progress.emit(n, n, self.load_id)
+
+            # Shared vertices and edges, neighbours may come from different
+            # batches
+            if not self.isInterruptionRequested():
+                self.topologyReady.emit(TopologyIndex(self.layer), self.load_id)
+                self.complete = True
+
+    def flush(self, records):
+        """
+        Prepare decoded records for queries and drawing and send them to the
+        GUI thread
+        """
+        if not records:
+            return
+
+        # Rings of the batch in one flat buffer
+        batch = PolygonBatch(PolygonStore.from_records(records))
+        self.layer.extend(batch.layer)
+
+        # Slab decomposition of polygons with many vertices, by batch position
+        batch.prepared = prepare_polygons(batch.layer, self.prepare_threshold)
+
+        # Simplified polygons for drawing
+        x_min, y_min, x_max, y_max = self.extent
+        batch.lod_errors, batch.lod = lod_pyramid(batch.layer, max(x_max - x_min, y_max - y_min))
+
+        self.batchReady.emit(batch, self.load_id)
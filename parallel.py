@@ -0,0 +1,134 @@
+"""
+Multi-core point classification
+
+Polygon coordinates, query points and results live in shared memory, so
+worker processes only receive index ranges of the points to classify.
+"""
+import os
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from vectorized import VectorAlgorithms
+from prepared import prepare_polygons
+from polygonstore import PolygonStore
+from querystats import QueryStats
+
+
+def share_array(arr):
+    # Copy array into a new shared memory block
+    shm = SharedMemory(create=True, size=max(arr.nbytes, 1))
+    view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+    view[...] = arr
+    return shm
+
+
+# Layer and shared blocks attached in worker process
+_worker = {}
+_blocks = {}
+
+
+def _attach(name, shape, dtype):
+    # Attach shared block once per worker and return array view
+    if name not in _blocks:
+        shm = SharedMemory(name=name)
+        _blocks[name] = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+    return _blocks[name][1]
+
+
+def _release(keep):
+    # Detach blocks of finished calls
+    for name in [name for name in _blocks if name not in keep]:
+        shm, arr = _blocks.pop(name)
+        del arr
+        shm.close()
+
+
+def _init_worker(coords_name, n_coords, ring_offsets, geom_offsets, bounds, method, prepare_threshold):
+    # Rebuild polygon layer over shared coordinates without copying
+    coords = _attach(coords_name, (n_coords, 2), np.float64)
+    _worker["coords"] = coords_name
+    _worker["polygons"] = PolygonStore(coords, ring_offsets, geom_offsets, bounds)
+    _worker["prepared"] = prepare_polygons(_worker["polygons"], prepare_threshold)
+    _worker["method"] = method
+
+
+def _classify_range(task):
+    # Classify points[start:stop] and write results to shared output,
+    # returns work counters of the range
+    points_name, index_name, status_name, m, start, stop = task
+    _release((_worker["coords"], points_name, index_name, status_name))
+
+    points = _attach(points_name, (m, 2), np.float64)
+    index = _attach(index_name, (m,), np.int64)
+    status = _attach(status_name, (m,), np.int8)
+
+    stats = QueryStats(_worker["method"], "parallel")
+    index[start:stop], status[start:stop] = VectorAlgorithms().classify_points(
+        points[start:stop], _worker["polygons"], None, _worker["method"], _worker["prepared"], stats)
+    return stats
+
+
+class ParallelClassifier:
+    """
+    Process pool classifying points against a polygon layer in shared memory
+
+    polygons is a list of (n, 2) arrays or a PolygonStore.
+    """
+
+    def __init__(self, polygons, bounds=None, method="rc", workers=None, chunk_size=100_000, prepare_threshold=1000):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.method = method
+
+        # Polygons in one flat coordinate block with ring offsets
+        if not isinstance(polygons, PolygonStore):
+            polygons = PolygonStore.from_arrays(polygons)
+        if bounds is None:
+            bounds = polygons.bounds
+
+        self.coords = share_array(polygons.coords)
+        self.pool = Pool(self.workers, initializer=_init_worker,
+                         initargs=(self.coords.name, len(polygons.coords), polygons.ring_offsets, polygons.geom_offsets,
+                                   np.asarray(bounds, dtype=np.float64), method, prepare_threshold))
+
+    def classify_points(self, points, stats=None):
+        """
+        Classify points in parallel, same result as VectorAlgorithms.classify_points
+
+        Counters of all workers are added to stats if given, stage times are
+        summed over workers.
+        """
+        if stats is None:
+            stats = QueryStats(self.method, "parallel")
+        points = np.ascontiguousarray(points, dtype=np.float64).reshape(-1, 2)
+        m = len(points)
+
+        blocks = [share_array(points), share_array(np.full(m, -1, dtype=np.int64)), share_array(np.zeros(m, dtype=np.int8))]
+        try:
+            tasks = [(blocks[0].name, blocks[1].name, blocks[2].name, m, s, min(s + self.chunk_size, m))
+                     for s in range(0, m, self.chunk_size)]
+            for part in self.pool.imap_unordered(_classify_range, tasks):
+                stats.merge(part)
+
+            index = np.ndarray((m,), dtype=np.int64, buffer=blocks[1].buf).copy()
+            status = np.ndarray((m,), dtype=np.int8, buffer=blocks[2].buf).copy()
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+
+        return index, status
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        self.coords.close()
+        self.coords.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
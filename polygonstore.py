@@ -0,0 +1,122 @@
+import numpy as np
+
+
+class PolygonStore:
+    """
+    Polygon layer in one flat coordinate buffer with ring and geometry offsets
+
+    coords[ring_offsets[r]:ring_offsets[r + 1]] are vertices of ring r and
+    ring_offsets[geom_offsets[i]:geom_offsets[i + 1]] are rings of geometry
+    i, the layout of GeoArrow with the polygon level of MultiPolygons
+    flattened. Outer rings and holes of all parts of a geometry are stored
+    together and evaluated in one pass, holes and parts follow from crossing
+    parity. Min-max box of every geometry is kept in bounds.
+    """
+
+    def __init__(self, coords=None, ring_offsets=None, geom_offsets=None, bounds=None):
+        self.coords = np.zeros((0, 2)) if coords is None else coords
+        self.ring_offsets = np.zeros(1, dtype=np.int64) if ring_offsets is None else ring_offsets
+        self.geom_offsets = np.zeros(1, dtype=np.int64) if geom_offsets is None else geom_offsets
+        self.bounds = self.compute_bounds() if bounds is None else bounds
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Build store from (xy, parts) pairs, parts are ring offsets into xy
+        ending with len(xy) as returned by ShpReader.record
+        """
+        records = list(records)
+        if not records:
+            return cls()
+
+        coords = np.concatenate([xy for xy, _ in records]).astype(np.float64).reshape(-1, 2)
+
+        # Shift local ring offsets by position of geometry in coords
+        starts = np.cumsum([0] + [len(xy) for xy, _ in records])
+        ring_offsets = np.concatenate([parts[:-1] + start for (_, parts), start in zip(records, starts)] + [starts[-1:]])
+        geom_offsets = np.zeros(len(records) + 1, dtype=np.int64)
+        geom_offsets[1:] = np.cumsum([len(parts) - 1 for _, parts in records])
+
+        return cls(coords, ring_offsets.astype(np.int64), geom_offsets)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        # Store of single ring polygons given as (n, 2) arrays
+        return cls.from_records((xy, np.array([0, len(xy)], dtype=np.int64)) for xy in arrays)
+
+    def compute_bounds(self):
+        # Min-max box of every geometry, NaN for empty ones
+        n = len(self)
+        bounds = np.full((n, 4), np.nan)
+
+        first = self.ring_offsets[self.geom_offsets[:-1]]
+        last = self.ring_offsets[self.geom_offsets[1:]]
+        filled = np.nonzero(last > first)[0]
+
+        # Geometries are contiguous, so reduction from start of one filled
+        # geometry to start of the next covers exactly its vertices
+        if len(filled):
+            coords = self.coords[:self.ring_offsets[-1]]
+            bounds[filled, :2] = np.minimum.reduceat(coords, first[filled])
+            bounds[filled, 2:] = np.maximum.reduceat(coords, first[filled])
+
+        return bounds
+
+    def __len__(self):
+        return len(self.geom_offsets) - 1
+
+    def geometry(self, i):
+        """
+        Vertices of geometry i and offsets of its rings into them
+        """
+        r0 = self.geom_offsets[i]
+        r1 = self.geom_offsets[i + 1]
+        rings = self.ring_offsets[r0:r1 + 1]
+        start = rings[0]
+        return self.coords[start:rings[-1]], rings - start
+
+    def rings(self, i):
+        # List of ring arrays of geometry i
+        xy, rings = self.geometry(i)
+        return [xy[rings[k]:rings[k + 1]] for k in range(len(rings) - 1)]
+
+    def box(self, i):
+        # Min-max box of geometry i as tuple, None for empty geometry
+        box = tuple(self.bounds[i].tolist())
+        return None if np.isnan(box[0]) else box
+
+    def with_coords(self, keep):
+        """
+        Store of the same rings keeping only vertices where keep is True
+        """
+        # Kept vertices before every ring start
+        kept = np.zeros(len(keep) + 1, dtype=np.int64)
+        kept[1:] = np.cumsum(keep)
+        ring_offsets = kept[self.ring_offsets]
+        return PolygonStore(self.coords[keep], ring_offsets, self.geom_offsets.copy(), self.bounds)
+
+    def extend(self, other):
+        """
+        Append geometries of other store, buffers grow geometrically
+        """
+        n_coords = len(self.coords)
+        n_rings = len(self.ring_offsets) - 1
+        n_geoms = len(self)
+
+        self.coords = self.grow("_coords", self.coords, other.coords)
+        self.ring_offsets = self.grow("_ring_offsets", self.ring_offsets, other.ring_offsets[1:] + n_coords)
+        self.geom_offsets = self.grow("_geom_offsets", self.geom_offsets, other.geom_offsets[1:] + n_rings)
+        self.bounds = self.grow("_bounds", self.bounds, other.bounds)
+
+        return range(n_geoms, len(self))
+
+    def grow(self, name, current, tail):
+        # View of current data followed by tail in buffer with spare capacity
+        buffer = getattr(self, name, None)
+        n = len(current)
+        if buffer is None or buffer is not current.base or len(buffer) < n + len(tail):
+            buffer = np.empty((max(2 * n, n + len(tail)),) + current.shape[1:], dtype=current.dtype)
+            buffer[:n] = current
+            setattr(self, name, buffer)
+        buffer[n:n + len(tail)] = tail
+        return buffer[:n + len(tail)]
@@ -0,0 +1,216 @@
+import numpy as np
+
+from polygonstore import PolygonStore
+from vectorized import ring_ends
+
+
+# Maximal number of point-edge pairs evaluated at once
+BLOCK_SIZE = 1 << 20
+
+
+class PreparedPolygon:
+    """
+    Polygon with edges decomposed into horizontal slabs
+
+    Every slab keeps the edges whose y range overlaps it, so a query at y
+    tests only edges of one slab instead of all polygon edges. Supports
+    ray crossing and integer winding number, both need only edges which
+    straddle or touch the horizontal line through the query point. Edges
+    of all rings given by ring offsets are decomposed together.
+    """
+
+    def __init__(self, xy, rings=None, edges_per_slab=4, max_copies=8):
+        self.xy = xy
+        n = len(xy)
+
+        x1 = xy[:, 0]
+        y1 = xy[:, 1]
+        x2, y2 = ring_ends(x1, y1, rings)
+
+        self.y_min = float(y1.min())
+        self.y_max = float(y1.max())
+
+        # Long edges spanning many slabs are stored repeatedly, halve slab
+        # count until total number of stored edges is bounded
+        slabs = max(1, n // edges_per_slab)
+        while True:
+            self.slabs = slabs
+            self.h = (self.y_max - self.y_min) / slabs or 1.0
+            lo = self.slab(np.minimum(y1, y2))
+            hi = self.slab(np.maximum(y1, y2))
+            counts = hi - lo + 1
+            total = int(counts.sum())
+            if total <= max_copies * n or slabs == 1:
+                break
+            slabs = max(1, slabs // 2)
+
+        # Edge and slab id of every stored copy
+        edge = np.repeat(np.arange(n), counts)
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        slab = np.repeat(lo, counts) + (np.arange(total) - first)
+
+        # Group edges by slab, offsets[s]:offsets[s + 1] are edges of slab s
+        order = np.argsort(slab, kind="stable")
+        edge = edge[order]
+        self.offsets = np.zeros(slabs + 1, dtype=np.int64)
+        self.offsets[1:] = np.cumsum(np.bincount(slab, minlength=slabs))
+
+        # Edge end points in slab order
+        self.x1 = x1[edge]
+        self.y1 = y1[edge]
+        self.x2 = x2[edge]
+        self.y2 = y2[edge]
+
+        # Ring of every stored edge
+        if rings is None:
+            self.n_rings = 1
+            self.ring = np.zeros(total, dtype=np.int64)
+        else:
+            self.n_rings = len(rings) - 1
+            self.ring = np.repeat(np.arange(self.n_rings), np.diff(rings))[edge]
+
+    def slab(self, y):
+        # Index of slab containing y
+        return np.clip(((y - self.y_min) / self.h).astype(np.int64), 0, self.slabs - 1)
+
+    def slab_edges(self, y):
+        # Number of edges tested for a query at y
+        if y < self.y_min or y > self.y_max:
+            return 0
+        s = int(self.slab(np.array([y]))[0])
+        return int(self.offsets[s + 1] - self.offsets[s])
+
+    def slab_edges_points(self, py):
+        # Number of edges tested for queries at all y of py
+        s = self.slab(py[(py >= self.y_min) & (py <= self.y_max)])
+        return int((self.offsets[s + 1] - self.offsets[s]).sum())
+
+    def pairs(self, px, py):
+        """
+        Yield point and edge index pairs of points with edges of their slabs
+        """
+        # Points outside y range have no edges
+        valid = np.nonzero((py >= self.y_min) & (py <= self.y_max))[0]
+        slab = self.slab(py[valid])
+        start = self.offsets[slab]
+        counts = self.offsets[slab + 1] - start
+
+        # Split points so that number of pairs in a block is bounded
+        ends = np.cumsum(counts)
+        s = 0
+        while s < len(valid):
+            base = ends[s - 1] if s > 0 else 0
+            e = max(s + 1, int(np.searchsorted(ends, base + BLOCK_SIZE, side="right")))
+            c = counts[s:e]
+            point = np.repeat(np.arange(s, e), c)
+            first = np.repeat(np.cumsum(c) - c, c)
+            edge = np.repeat(start[s:e], c) + (np.arange(len(point)) - first)
+            yield valid, point, edge
+            s = e
+
+    def ray_crossing_points(self, px, py):
+        # Ray crossing for many points, returns codes
+        result = np.zeros(len(px), dtype=np.int8)
+        kl = np.zeros(len(px), dtype=np.int64)
+        kr = np.zeros(len(px), dtype=np.int64)
+        on_vertex = np.zeros(len(px), dtype=bool)
+
+        for valid, point, edge in self.pairs(px, py):
+            ids = valid[point]
+            qx = px[ids]
+            qy = py[ids]
+
+            # Reduce coordinates to points
+            p1x = self.x1[edge] - qx
+            p1y = self.y1[edge] - qy
+            p2x = self.x2[edge] - qx
+            p2y = self.y2[edge] - qy
+
+            on_vertex[ids[(p1x == 0) & (p1y == 0)]] = True
+
+            lower = (p2y < 0) != (p1y < 0)
+            upper = (p2y > 0) != (p1y > 0)
+            cross = lower | upper
+
+            # Intersection x coordinate of crossing edges
+            xm = np.divide(p2x*p1y - p1x*p2y, p2y - p1y, out=np.zeros_like(p1x), where=cross)
+
+            kl += np.bincount(ids[lower & (xm < 0)], minlength=len(px))
+            kr += np.bincount(ids[upper & (xm > 0)], minlength=len(px))
+
+        result[kr % 2 == 1] = 1
+        result[(kl % 2) != (kr % 2)] = -1
+        result[on_vertex] = -1
+        return result
+
+    def winding_number_int_points(self, px, py):
+        # Integer winding number for many points, returns codes
+        result = np.zeros(len(px), dtype=np.int8)
+        rings_in = np.zeros(len(px), dtype=np.int64)
+        boundary = np.zeros(len(px), dtype=bool)
+
+        for valid, point, edge in self.pairs(px, py):
+            ids = valid[point]
+            qx = px[ids]
+            qy = py[ids]
+            x1 = self.x1[edge]
+            y1 = self.y1[edge]
+            x2 = self.x2[edge]
+            y2 = self.y2[edge]
+
+            # Half-plane test
+            det = (x2 - x1)*(qy - y1) - (y2 - y1)*(qx - x1)
+
+            # Vertex or collinear point inside edge min-max box
+            on = ((x1 == qx) & (y1 == qy)) | ((det == 0)
+                  & (np.minimum(x1, x2) <= qx) & (qx <= np.maximum(x1, x2))
+                  & (np.minimum(y1, y2) <= qy) & (qy <= np.maximum(y1, y2)))
+            boundary[ids[on]] = True
+
+            # Signed crossings of upward and downward edges
+            up = (y1 <= qy) & (y2 > qy) & (det > 0)
+            down = (y1 > qy) & (y2 <= qy) & (det < 0)
+            if self.n_rings == 1:
+                wn = np.bincount(point[up], minlength=len(valid)) - np.bincount(point[down], minlength=len(valid))
+                rings_in[valid[wn != 0]] += 1
+                continue
+
+            crossed = np.flatnonzero(up | down)
+            if len(crossed) == 0:
+                continue
+
+            # Nonzero winding of every ring, all edges of a point are in
+            # one block
+            keys = point[crossed] * self.n_rings + self.ring[edge[crossed]]
+            order = np.argsort(keys, kind="stable")
+            keys = keys[order]
+            starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+            wn = np.add.reduceat(np.where(up[crossed], 1, -1)[order], starts)
+            rings_in += np.bincount(valid[keys[starts][wn != 0] // self.n_rings], minlength=len(px))
+
+        # Holes and parts by parity of rings
+        result[rings_in % 2 == 1] = 1
+        result[boundary] = -1
+        return result
+
+    def ray_crossing(self, q):
+        # Analyze point and polygon position using ray crossing algorithm
+        return int(self.ray_crossing_points(np.array([q[0]], dtype=np.float64), np.array([q[1]], dtype=np.float64))[0])
+
+    def winding_number_int(self, q):
+        # Analyze point and polygon position using integer winding number
+        return int(self.winding_number_int_points(np.array([q[0]], dtype=np.float64), np.array([q[1]], dtype=np.float64))[0])
+
+
+def prepare_polygons(polygons, threshold=1000):
+    """
+    Prepare polygons with at least threshold vertices, keyed by polygon index
+
+    polygons is a list of (n, 2) arrays or a PolygonStore.
+    """
+    if isinstance(polygons, PolygonStore):
+        # Vertex count of every geometry from its ring offsets
+        sizes = np.diff(polygons.ring_offsets[polygons.geom_offsets])
+        return {int(i): PreparedPolygon(*polygons.geometry(i)) for i in np.nonzero(sizes >= threshold)[0]}
+
+    return {i: PreparedPolygon(xy) for i, xy in enumerate(polygons) if len(xy) >= threshold}
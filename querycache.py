@@ -0,0 +1,40 @@
+from collections import OrderedDict
+
+
+class QueryCache:
+    """
+    Least recently used results of point queries
+
+    Keys include the version of the polygon layer, so results computed
+    before a geometry change are never returned after it.
+    """
+
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        # Cached result of key, None if missing
+        value = self.items.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        # Store result, least recently used one is dropped when full
+        self.items[key] = value
+        self.items.move_to_end(key)
+        if len(self.items) > self.capacity:
+            self.items.popitem(last=False)
+
+    def clear(self):
+        self.items.clear()
+
+    def __len__(self):
+        return len(self.items)
@@ -0,0 +1,90 @@
+import logging
+from time import perf_counter
+
+
+log = logging.getLogger("querystats")
+
+# Callables receiving QueryStats of every finished query
+hooks = []
+
+
+class QueryStats:
+    """
+    Work counters and wall time per stage of one point query or one batch
+    of points
+
+    Stages are filter (spatial index and min-max boxes), test (exact point
+    and polygon position) and paint (highlighting and repaint of result
+    polygons). Times are in seconds. Batch counters are summed over points,
+    so in_box counts point and polygon pairs and edges counts point and
+    edge pairs.
+    """
+
+    STAGES = ("filter", "test", "paint")
+
+    def __init__(self, method, engine):
+        self.method = method
+        self.engine = engine
+
+        # Points classified, 1 for a single query
+        self.points = 0
+
+        # Candidates returned by spatial index
+        self.polygons = 0
+
+        # Candidates whose min-max box contains the point
+        self.in_box = 0
+
+        # Polygon edges evaluated by exact tests
+        self.edges = 0
+
+        self.result = None
+        self.shared = 0
+
+        # Result taken from query cache, no filtering or tests were run
+        self.cached = False
+
+        self.times = dict.fromkeys(self.STAGES, 0.0)
+
+    def lap(self, stage, start):
+        # Add time since start to stage, returns end time as start of next lap
+        now = perf_counter()
+        self.times[stage] += now - start
+        return now
+
+    def merge(self, other):
+        # Add counters and times of other part of the same batch, parts are
+        # tested against the same polygons
+        self.points += other.points
+        self.polygons = max(self.polygons, other.polygons)
+        self.in_box += other.in_box
+        self.edges += other.edges
+        self.shared += other.shared
+        for stage, t in other.times.items():
+            self.times[stage] += t
+
+    def total(self):
+        return sum(self.times.values())
+
+    def summary(self):
+        # One line for status bar
+        ms = {stage: 1000 * t for stage, t in self.times.items()}
+        source = "cached" if self.cached else self.engine
+        points = f"{self.points} points, " if self.points > 1 else ""
+        return (f"{self.method} ({source}): {points}{self.polygons} polygons, {self.in_box} in box, "
+                f"{self.edges} edges | filter {ms['filter']:.2f} ms, test {ms['test']:.2f} ms, "
+                f"paint {ms['paint']:.2f} ms, total {1000 * self.total():.2f} ms")
+
+    def as_dict(self):
+        return {"method": self.method, "engine": self.engine, "points": self.points, "polygons": self.polygons,
+                "in_box": self.in_box, "edges": self.edges, "result": self.result,
+                "shared": self.shared, "cached": self.cached, "times": dict(self.times)}
+
+
+def report(stats):
+    """
+    Pass finished query to log and hooks
+    """
+    log.debug("%s", stats.summary())
+    for hook in hooks:
+        hook(stats)
@@ -0,0 +1,160 @@
+import mmap
+import os
+import struct
+
+import numpy as np
+
+
+# Shape type codes of ESRI shapefile
+SHAPE_TYPES = {
+    0: "Null", 1: "Point", 3: "LineString", 5: "Polygon", 8: "MultiPoint",
+    11: "PointZ", 13: "LineStringZ", 15: "PolygonZ", 18: "MultiPointZ",
+    21: "PointM", 23: "LineStringM", 25: "PolygonM", 28: "MultiPointM", 31: "MultiPatch",
+}
+POLYGON_TYPES = (5, 15, 25)
+
+
+class ShpReader:
+    """
+    Memory-mapped reader of polygon geometry from .shp and .shx files
+
+    Records are located through the .shx offsets, so any record can be read
+    without decoding the others. Polygon records are returned with all
+    their rings, holes and parts of multipolygons included. Attributes from
+    .dbf are read only on request.
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        base = os.path.splitext(file_name)[0]
+
+        with open(file_name, "rb") as f:
+            self.shp = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Main file header
+        code, = struct.unpack(">i", self.shp[0:4])
+        if code != 9994:
+            raise ValueError(f"Not a shapefile: {file_name}")
+        self.shape_type, = struct.unpack("<i", self.shp[32:36])
+        self.bounds = struct.unpack("<4d", self.shp[36:68])
+
+        # Record offsets in bytes from index file, or from scanning records
+        shx = self.sidecar(base, ".shx")
+        if shx is not None:
+            with open(shx, "rb") as f:
+                data = f.read()
+            index = np.frombuffer(data, dtype=">i4", offset=100).reshape(-1, 2)
+            self.offsets = index[:, 0].astype(np.int64) * 2
+        else:
+            self.offsets = self.scan()
+
+        self.base = base
+
+    def sidecar(self, base, ext):
+        # Path of file with same name and given extension in any letter case
+        for name in (base + ext, base + ext.upper()):
+            if os.path.exists(name):
+                return name
+        return None
+
+    def scan(self):
+        # Walk record headers when no index file exists
+        offsets = []
+        pos = 100
+        end = len(self.shp)
+        while pos + 8 <= end:
+            _, length = struct.unpack(">2i", self.shp[pos:pos + 8])
+            offsets.append(pos)
+            pos += 8 + length * 2
+        return np.array(offsets, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def record(self, i):
+        """
+        Coordinates (n, 2) and part offsets of record i, None for null shape
+        """
+        pos = int(self.offsets[i]) + 8
+        shape_type, = struct.unpack("<i", self.shp[pos:pos + 4])
+        if shape_type == 0:
+            return None
+        if shape_type not in POLYGON_TYPES:
+            raise ValueError(f"Shapefile contains: {SHAPE_TYPES.get(shape_type, shape_type)}")
+
+        # Skip record bounding box
+        n_parts, n_points = struct.unpack("<2i", self.shp[pos + 36:pos + 44])
+        parts = np.empty(n_parts + 1, dtype=np.int64)
+        parts[:n_parts] = np.frombuffer(self.shp, dtype="<i4", count=n_parts, offset=pos + 44)
+        parts[n_parts] = n_points
+
+        xy = np.frombuffer(self.shp, dtype="<f8", count=2 * n_points, offset=pos + 44 + 4 * n_parts)
+        return xy.reshape(-1, 2).astype(np.float64), parts
+
+    def rings(self, i):
+        # List of ring arrays of record i
+        rec = self.record(i)
+        if rec is None:
+            return []
+        xy, parts = rec
+        return [xy[parts[k]:parts[k + 1]] for k in range(len(parts) - 1)]
+
+    def attributes(self, fields=None):
+        """
+        Columns of .dbf attribute table as dict of lists
+        """
+        dbf = self.sidecar(self.base, ".dbf")
+        if dbf is None:
+            raise ValueError(f"No attribute table for: {self.file_name}")
+
+        # Text encoding from .cpg, dBase default otherwise
+        encoding = "latin-1"
+        cpg = self.sidecar(self.base, ".cpg")
+        if cpg is not None:
+            with open(cpg) as f:
+                encoding = f.read().strip() or encoding
+
+        with open(dbf, "rb") as f:
+            data = f.read()
+
+        n_records, header_len, record_len = struct.unpack("<IHH", data[4:12])
+
+        # Field descriptors end with 0x0D
+        columns = []
+        pos = 32
+        start = 1
+        while data[pos] != 0x0D:
+            name = data[pos:pos + 11].split(b"\0")[0].decode(encoding)
+            kind = chr(data[pos + 11])
+            length = data[pos + 16]
+            columns.append((name, kind, start, length))
+            start += length
+            pos += 32
+
+        if fields is not None:
+            missing = set(fields) - {c[0] for c in columns}
+            if missing:
+                raise ValueError(f"Unknown attribute: {', '.join(sorted(missing))}")
+            columns = [c for c in columns if c[0] in fields]
+
+        table = {name: [] for name, _, _, _ in columns}
+        for r in range(n_records):
+            rec = data[header_len + r * record_len:header_len + (r + 1) * record_len]
+            for name, kind, start, length in columns:
+                value = rec[start:start + length].decode(encoding).strip()
+                if kind in "NF":
+                    value = float(value) if value and value.strip("*") else None
+                    if value is not None and value.is_integer() and kind == "N":
+                        value = int(value)
+                table[name].append(value)
+
+        return table
+
+    def close(self):
+        self.shp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,178 @@
+import numpy as np
+
+
+def douglas_peucker(xy, tol):
+    """
+    Mask of polyline vertices kept by Douglas-Peucker with tolerance tol
+    """
+    n = len(xy)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[0] = keep[-1] = True
+
+    # Chains still to be simplified, as first and last vertex index
+    stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j <= i + 1:
+            continue
+
+        ax, ay = xy[i]
+        dx, dy = xy[j] - xy[i]
+        seg = xy[i + 1:j]
+
+        # Distance of inner vertices from the chord
+        length = np.hypot(dx, dy)
+        if length == 0:
+            dist = np.hypot(seg[:, 0] - ax, seg[:, 1] - ay)
+        else:
+            dist = np.abs(dx*(seg[:, 1] - ay) - dy*(seg[:, 0] - ax)) / length
+
+        k = int(np.argmax(dist))
+        if dist[k] > tol:
+            m = i + 1 + k
+            keep[m] = True
+            stack.append((i, m))
+            stack.append((m, j))
+
+    return keep
+
+
+def simplify_ring(xy, tol):
+    """
+    Simplify polygon ring, split at the vertex farthest from the first one
+    """
+    if len(xy) < 4:
+        return xy
+
+    # Both halves of the ring are simplified as open polylines
+    m = int(np.argmax(np.hypot(xy[:, 0] - xy[0, 0], xy[:, 1] - xy[0, 1])))
+    keep = np.zeros(len(xy), dtype=bool)
+    keep[:m + 1] = douglas_peucker(xy[:m + 1], tol)
+    keep[m:] |= douglas_peucker(xy[m:], tol)
+
+    return xy[keep]
+
+
+def simplify_rings(xy, ring_offsets, tol):
+    """
+    Mask of vertices kept by Douglas-Peucker in all rings of flat buffer
+
+    Keeps the same vertices as simplify_ring on every ring, but each step
+    splits all open chains of all rings together.
+    """
+    keep = np.zeros(len(xy), dtype=bool)
+    starts = ring_offsets[:-1]
+    lengths = np.diff(ring_offsets)
+    ends = starts + lengths - 1
+
+    # Short rings are kept as they are
+    short = lengths < 4
+    for s, n in zip(starts[short], lengths[short]):
+        keep[s:s + n] = True
+
+    # Split every ring at the vertex farthest from its first one
+    long = np.nonzero(~short)[0]
+    if len(long) == 0:
+        return keep
+    s0 = starts[long]
+    e0 = ends[long]
+    ring = np.repeat(np.arange(len(long)), lengths[long])
+    idx = ranges(s0, lengths[long])
+    dist = np.hypot(xy[idx, 0] - xy[s0[ring], 0], xy[idx, 1] - xy[s0[ring], 1])
+    m = first_argmax(dist, idx, lengths[long])
+
+    keep[s0] = True
+    keep[e0] = True
+    keep[m] = True
+
+    # Open chains as first and last vertex index
+    seg_s = np.concatenate([s0, m])
+    seg_e = np.concatenate([m, e0])
+
+    while len(seg_s):
+        inner = seg_e - seg_s - 1
+        valid = inner > 0
+        seg_s = seg_s[valid]
+        seg_e = seg_e[valid]
+        inner = inner[valid]
+        if len(seg_s) == 0:
+            break
+
+        # Inner vertices of all chains
+        seg = np.repeat(np.arange(len(seg_s)), inner)
+        idx = ranges(seg_s + 1, inner)
+
+        # Distance of inner vertices from their chord
+        ax = xy[seg_s[seg], 0]
+        ay = xy[seg_s[seg], 1]
+        dx = xy[seg_e[seg], 0] - ax
+        dy = xy[seg_e[seg], 1] - ay
+        px = xy[idx, 0] - ax
+        py = xy[idx, 1] - ay
+        length = np.hypot(dx, dy)
+        dist = np.where(length == 0, np.hypot(px, py),
+                        np.abs(dx*py - dy*px) / np.where(length == 0, 1, length))
+
+        # Farthest vertex of every chain
+        far = first_argmax(dist, idx, inner)
+        split = np.maximum.reduceat(dist, np.cumsum(inner) - inner) > tol
+
+        # Chains farther than tol are split at their farthest vertex
+        far = far[split]
+        keep[far] = True
+        seg_s, seg_e = np.concatenate([seg_s[split], far]), np.concatenate([far, seg_e[split]])
+
+    return keep
+
+
+def ranges(starts, counts):
+    # Concatenated ranges starts[k], ..., starts[k] + counts[k] - 1
+    first = np.cumsum(counts) - counts
+    return np.repeat(starts - first, counts) + np.arange(counts.sum())
+
+
+def first_argmax(values, idx, counts):
+    # Index from idx of first maximal value in every group of counts elements
+    first = np.cumsum(counts) - counts
+    top = np.maximum.reduceat(values, first)
+    group = np.repeat(np.arange(len(counts)), counts)
+    pos = np.where(values == top[group], np.arange(len(values)), len(values))
+    return idx[np.minimum.reduceat(pos, first)]
+
+
+def lod_pyramid(layer, extent, levels=8, finest=1 / 8192):
+    """
+    Simplified copies of polygon layer for drawing at decreasing scales
+
+    Level k uses tolerance extent * finest * 2**k and is simplified from
+    level k - 1. Returns list of maximal deviations from full resolution
+    and list of levels, each a PolygonStore with the rings of layer.
+    """
+    errors = []
+    pyramid = []
+
+    current = layer
+    error = 0.0
+    for k in range(levels):
+        tol = extent * finest * 2**k
+        current = current.with_coords(simplify_rings(current.coords, current.ring_offsets, tol))
+
+        # Deviations of successive levels add up
+        error += tol
+        errors.append(error)
+        pyramid.append(current)
+
+    return errors, pyramid
+
+
+def lod_level(errors, pixel):
+    """
+    Coarsest level whose deviation stays within one pixel, -1 for full resolution
+    """
+    level = -1
+    for k, error in enumerate(errors):
+        if error <= pixel:
+            level = k
+    return level
@@ -0,0 +1,144 @@
+from bisect import bisect_left
+from math import ceil, sqrt
+
+
+class GridIndex:
+    """
+    Uniform grid spatial index over polygon bounding boxes
+    """
+
+    def __init__(self, boxes, cells_per_item=1.0, extent=None, capacity=None):
+        # Bounding boxes (x_min, y_min, x_max, y_max) of indexed polygons
+        boxes = list(boxes)
+        self.boxes = []
+        self.cells = {}
+        self.loaded = None
+
+        # Grid is sized for expected number of polygons
+        n = capacity if capacity is not None else len(boxes)
+        if n == 0 or (extent is None and not boxes):
+            self.nx = self.ny = 0
+            return
+
+        # Extent of the whole layer, given when boxes are inserted later
+        if extent is None:
+            extent = (min(box[0] for box in boxes), min(box[1] for box in boxes),
+                      max(box[2] for box in boxes), max(box[3] for box in boxes))
+        self.x_min, self.y_min, self.x_max, self.y_max = extent
+
+        width = self.x_max - self.x_min
+        height = self.y_max - self.y_min
+
+        # Roughly one cell per polygon, shaped by the extent aspect ratio
+        cell_count = max(1, int(n * cells_per_item))
+        if width > 0 and height > 0:
+            self.nx = max(1, int(round(sqrt(cell_count * width / height))))
+            self.ny = max(1, int(ceil(cell_count / self.nx)))
+        else:
+            self.nx = cell_count if width > 0 else 1
+            self.ny = cell_count if height > 0 else 1
+
+        self.dx = width / self.nx if width > 0 else 1.0
+        self.dy = height / self.ny if height > 0 else 1.0
+
+        for box in boxes:
+            self.insert(box)
+
+    def insert(self, box):
+        """
+        Register polygon box in all cells it overlaps, returns its index
+        """
+        i = len(self.boxes)
+        self.boxes.append(box)
+
+        x_min, y_min, x_max, y_max = box
+        c0, r0 = self.cell(x_min, y_min)
+        c1, r1 = self.cell(x_max, y_max)
+        for c in range(c0, c1 + 1):
+            for r in range(r0, r1 + 1):
+                self.cell_items(c, r).append(i)
+
+        return i
+
+    def cell_items(self, c, r):
+        # Polygons of cell c, r, cells of load_cells are listed on first use
+        items = self.cells.get((c, r))
+        if items is None:
+            items = []
+            if self.loaded is not None:
+                keys, offsets, loaded = self.loaded
+                key = c * self.ny + r
+                j = bisect_left(keys, key)
+                if j < len(keys) and keys[j] == key:
+                    items = loaded[offsets[j]:offsets[j + 1]].tolist()
+            self.cells[(c, r)] = items
+        return items
+
+    def cell_lists(self):
+        """
+        Occupied cells as sorted keys c * ny + r, offsets of their polygons
+        and polygon indices of all cells in one list
+        """
+        if self.loaded is not None:
+            for key in self.loaded[0].tolist():
+                self.cell_items(*divmod(key, self.ny))
+        keys = sorted(c * self.ny + r for (c, r), items in self.cells.items() if items)
+        offsets = [0]
+        items = []
+        for key in keys:
+            items.extend(self.cells[divmod(key, self.ny)])
+            offsets.append(len(items))
+        return keys, offsets, items
+
+    def load_cells(self, boxes, keys, offsets, items):
+        """
+        Replace indexed boxes and cells by those from cell_lists of an index
+        with the same grid, given as integer arrays. Cells stay in the arrays
+        until they are queried.
+        """
+        self.boxes = list(boxes)
+        self.cells = {}
+        self.loaded = (keys, offsets, items)
+
+    def cell(self, x, y):
+        # Column and row of the cell containing point x, y
+        c = min(max(int((x - self.x_min) / self.dx), 0), self.nx - 1)
+        r = min(max(int((y - self.y_min) / self.dy), 0), self.ny - 1)
+        return c, r
+
+    def query(self, x, y):
+        """
+        Indices of polygons whose bounding box may contain point x, y
+        """
+        if self.nx == 0:
+            return []
+
+        # Point outside the layer extent
+        if x < self.x_min or x > self.x_max or y < self.y_min or y > self.y_max:
+            return []
+
+        return self.cell_items(*self.cell(x, y))
+
+    def query_box(self, x_min, y_min, x_max, y_max):
+        """
+        Indices of polygons whose bounding box intersects the given box
+        """
+        if self.nx == 0:
+            return []
+
+        # Box outside the layer extent
+        if x_max < self.x_min or x_min > self.x_max or y_max < self.y_min or y_min > self.y_max:
+            return []
+
+        c0, r0 = self.cell(x_min, y_min)
+        c1, r1 = self.cell(x_max, y_max)
+
+        found = set()
+        for c in range(c0, c1 + 1):
+            for r in range(r0, r1 + 1):
+                found.update(self.cell_items(c, r))
+
+        # Keep layer order for drawing
+        return sorted(i for i in found
+                      if self.boxes[i][0] <= x_max and self.boxes[i][2] >= x_min
+                      and self.boxes[i][1] <= y_max and self.boxes[i][3] >= y_min)
@@ -0,0 +1,273 @@
+from time import perf_counter
+
+import numpy as np
+
+from querystats import QueryStats
+from vectorized import BLOCK_SIZE, ring_ends
+
+
+def crossing_x(x1, y1, x2, y2, px, py):
+    # Intersection of edge with horizontal line through point, reduced to
+    # the point as in ray crossing, decreases with x of the intersection
+    p1x = x1 - px
+    p1y = y1 - py
+    p2x = x2 - px
+    p2y = y2 - py
+    return (p2x*p1y - p1x*p2y) / (p2y - p1y)
+
+
+class SweepJoin:
+    """
+    Polygon edges of a layer sorted for plane-sweep joins of point sets
+
+    Points and edges are sorted by y and the sweep line moves upwards in
+    bands of points. Edges enter the active edge list when the band
+    reaches their lower end and leave once it has passed their upper end.
+    Active edges crossing the whole band keep their order in x inside
+    every polygon, so crossings to the left and right of a point are
+    counted by bisection in that order. Only edges ending inside the band
+    are paired with the band points in the x range of their polygon.
+
+    Edges are extracted and sorted once, join may be called for any
+    number of point sets.
+    """
+
+    def __init__(self, layer, band_points=512):
+        self.layer = layer
+        self.band_points = band_points
+        self.n_polygons = len(layer)
+
+        # Edges of all rings of the layer with their polygon
+        coords = layer.coords[:layer.ring_offsets[-1]]
+        self.x1 = np.ascontiguousarray(coords[:, 0])
+        self.y1 = np.ascontiguousarray(coords[:, 1])
+        self.x2, self.y2 = ring_ends(self.x1, self.y1, layer.ring_offsets)
+        rings = np.repeat(np.arange(len(layer.ring_offsets) - 1), np.diff(layer.ring_offsets))
+        self.owner = np.repeat(np.arange(self.n_polygons), np.diff(layer.geom_offsets))[rings]
+        self.y_low = np.minimum(self.y1, self.y2)
+        self.y_high = np.maximum(self.y1, self.y2)
+
+        # Change of x per unit of y, 0 for horizontal edges
+        dy = self.y2 - self.y1
+        self.slope = np.divide(self.x2 - self.x1, dy, out=np.zeros_like(dy), where=dy != 0)
+
+        # Polygon x range, only points inside it can be inside the polygon
+        self.x_min = layer.bounds[:, 0]
+        self.x_max = layer.bounds[:, 2]
+
+        # Edges in order of entering the sweep
+        self.entering = np.argsort(self.y_low, kind="stable")
+        self.entering_y = self.y_low[self.entering]
+
+    def x_at(self, edges, y):
+        # x coordinate of edges at y
+        return self.x1[edges] + (y - self.y1[edges])*self.slope[edges]
+
+    def order_spans(self, edges, y_first, y_last):
+        """
+        Edges crossing the whole band sorted by polygon and x, and edges of
+        polygons whose edges cross each other inside the band
+        """
+        owner = self.owner[edges]
+        edges = edges[np.lexsort((self.x_at(edges, 0.5*(y_first + y_last)), owner))]
+        owner = self.owner[edges]
+
+        # Straight edges ordered at both ends of the band do not cross in it
+        same = owner[1:] == owner[:-1]
+        swapped = same & ((np.diff(self.x_at(edges, y_first)) < 0) | (np.diff(self.x_at(edges, y_last)) < 0))
+        if swapped.any():
+            crossing = np.isin(owner, owner[1:][swapped])
+            return edges[~crossing], edges[crossing]
+        return edges, edges[:0]
+
+    def first_below(self, edges, lo, hi, px, py, zero, stats):
+        """
+        First position in edges[lo:hi] whose crossing_x is below 0, or at
+        most 0 if zero is True, hi if there is none
+        """
+        lo = lo.copy()
+        hi = hi.copy()
+        live = np.flatnonzero(lo < hi)
+        while len(live):
+            mid = (lo[live] + hi[live]) // 2
+            e = edges[mid]
+            stats.edges += len(live)
+            xm = crossing_x(self.x1[e], self.y1[e], self.x2[e], self.y2[e], px[live], py[live])
+            below = (xm <= 0) if zero else (xm < 0)
+            hi[live[below]] = mid[below]
+            lo[live[~below]] = mid[~below] + 1
+            live = live[lo[live] < hi[live]]
+        return lo
+
+    def positions(self, points, stats):
+        """
+        Yield positions of points against the polygons of their min-max
+        boxes in one plane sweep, band by band, as arrays of point index,
+        polygon index and status code, 1 inside, -1 on the boundary, 0
+        outside. Pairs without any crossing are outside and left out.
+        """
+        m = len(points)
+        start = perf_counter()
+        if m == 0 or self.n_polygons == 0:
+            return
+
+        px = points[:, 0]
+        py = points[:, 1]
+        x1, y1, x2, y2 = self.x1, self.y1, self.x2, self.y2
+        owner = self.owner
+        n_polygons = self.n_polygons
+        stats.polygons += n_polygons
+
+        # Points in order of the sweep
+        order = np.argsort(py, kind="stable")
+
+        active = np.zeros(0, dtype=np.int64)
+        entered = 0
+        step = self.band_points
+        s = 0
+        while s < m:
+            e = min(m, s + step)
+            band = order[s:e]
+            y_first = py[band[0]]
+            y_last = py[band[-1]]
+
+            # Update active edge list for the band, edges stay entered when
+            # the band is narrowed
+            k = max(entered, int(np.searchsorted(self.entering_y, y_last, side="right")))
+            active = np.concatenate([active, self.entering[entered:k]])
+            active = active[self.y_high[active] >= y_first]
+            entered = k
+
+            # Edges crossing the band strictly are crossed by every point of it
+            through = (self.y_low[active] < y_first) & (self.y_high[active] > y_last)
+            spans, crossing = self.order_spans(active[through], y_first, y_last)
+            ends = np.concatenate([active[~through], crossing])
+
+            # Points of the band by x, each edge ending in the band pairs
+            # with a run of them
+            band = band[np.argsort(px[band], kind="stable")]
+            bx = px[band]
+            lo = np.searchsorted(bx, self.x_min[owner[ends]], side="left")
+            counts = np.searchsorted(bx, self.x_max[owner[ends]], side="right") - lo
+
+            # Polygons with spanning edges pair with the points in their x range
+            span_owner = owner[spans]
+            first = np.flatnonzero(np.concatenate([[True], span_owner[1:] != span_owner[:-1]])) if len(spans) else spans
+            last = np.append(first[1:], len(spans))
+            polygons = span_owner[first]
+            span_lo = np.searchsorted(bx, self.x_min[polygons], side="left")
+            span_counts = np.searchsorted(bx, self.x_max[polygons], side="right") - span_lo
+
+            total = int(counts.sum())
+            span_total = int(span_counts.sum())
+
+            # Narrow the band until its pairs fit in one block
+            if total + span_total > BLOCK_SIZE and step > 1:
+                step //= 2
+                continue
+
+            start = stats.lap("filter", start)
+
+            # Ray crossing over pairs of points and edges ending in the band
+            edge = np.repeat(ends, counts)
+            local = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(total)
+            pt = band[local]
+
+            p1x = x1[edge] - px[pt]
+            p1y = y1[edge] - py[pt]
+            p2x = x2[edge] - px[pt]
+            p2y = y2[edge] - py[pt]
+
+            on_vertex = (p1x == 0) & (p1y == 0)
+            lower = (p2y < 0) != (p1y < 0)
+            upper = (p2y > 0) != (p1y > 0)
+            xm = np.divide(p2x*p1y - p1x*p2y, p2y - p1y, out=np.zeros_like(p1x), where=lower | upper)
+            left = lower & (xm < 0)
+            right = upper & (xm > 0)
+
+            # Pairs without crossing or vertex do not change any result
+            keep = np.nonzero(left | right | on_vertex)[0]
+            stats.edges += total
+
+            # Spanning edges of polygon run by x, crossing_x falls along the
+            # run, so left and right crossings are counted by bisection
+            slot = np.repeat(np.arange(len(polygons)), span_counts)
+            span_local = np.repeat(span_lo - np.cumsum(span_counts) + span_counts, span_counts) + np.arange(span_total)
+            span_pt = band[span_local]
+            a = first[slot]
+            b = last[slot]
+            at_most = self.first_below(spans, a, b, px[span_pt], py[span_pt], True, stats)
+            below = self.first_below(spans, at_most, b, px[span_pt], py[span_pt], False, stats)
+
+            # Crossing counts per point and polygon from both kinds of edges
+            key = np.concatenate([local[keep] * n_polygons + owner[edge[keep]],
+                                  span_local * n_polygons + polygons[slot]])
+            kl_pair = np.concatenate([left[keep], b - below])
+            kr_pair = np.concatenate([right[keep], at_most - a])
+            vertex_pair = np.concatenate([on_vertex[keep], np.zeros(span_total, dtype=bool)])
+            sort = np.argsort(key, kind="stable")
+            key = key[sort]
+
+            # Parities per point and polygon, groups of equal keys
+            if len(key):
+                starts = np.nonzero(np.concatenate([[True], key[1:] != key[:-1]]))[0]
+                kl = np.add.reduceat(kl_pair[sort].astype(np.int64), starts)
+                kr = np.add.reduceat(kr_pair[sort].astype(np.int64), starts)
+                vertex = np.maximum.reduceat(vertex_pair[sort], starts)
+
+                group_point = band[key[starts] // n_polygons]
+                group_polygon = key[starts] % n_polygons
+                group_status = np.where(kr % 2 == 1, 1, 0)
+                group_status[((kl % 2) != (kr % 2)) | vertex] = -1
+                stats.in_box += len(starts)
+                yield group_point, group_polygon, group_status
+
+            start = stats.lap("test", start)
+            s = e
+            step = min(self.band_points, 2 * step)
+
+    def join(self, points, stats=None):
+        """
+        Classify many points against the layer in one plane sweep
+
+        Returns three arrays. The first is the index of the polygon: the
+        first containing polygon, else the first polygon holding the point
+        on its boundary, else -1. The second is the status code per point,
+        1 inside, 0 outside, -1 on the boundary. The third is the number of
+        polygons sharing a boundary point, 0 for other points. Work counters
+        and filter and test times are added to stats if given.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        m = len(points)
+        if stats is None:
+            stats = QueryStats("rc", "sweep")
+        stats.points += m
+
+        index = np.full(m, -1, dtype=np.int64)
+        status = np.zeros(m, dtype=np.int8)
+        shared = np.zeros(m, dtype=np.int64)
+
+        for group_point, group_polygon, group_status in self.positions(points, stats):
+            # Boundary points, first polygon and number of polygons sharing them
+            on = group_status == -1
+            points_on, first_on, count_on = np.unique(group_point[on], return_index=True, return_counts=True)
+            status[points_on] = -1
+            index[points_on] = group_polygon[on][first_on]
+            shared[points_on] = count_on
+
+            # Containing polygon wins over boundary, as in getRes
+            inside = group_status == 1
+            points_in, first_in = np.unique(group_point[inside], return_index=True)
+            status[points_in] = 1
+            index[points_in] = group_polygon[inside][first_in]
+            shared[points_in] = 0
+
+        return index, status, shared
+
+
+def sweep_join(points, layer, band_points=512, stats=None):
+    """
+    Classify many points against a polygon layer in one plane sweep, see
+    SweepJoin.join
+    """
+    return SweepJoin(layer, band_points).join(points, stats)
@@ -0,0 +1,164 @@
+import numpy as np
+import pytest
+from PyQt6.QtCore import QPointF
+from PyQt6.QtGui import QPolygonF
+
+from algorithms import Algorithms
+from polygonstore import PolygonStore
+from prepared import prepare_polygons
+from sweep import sweep_join
+from topology import TopologyIndex
+from vectorized import VectorAlgorithms
+
+
+def square(x0, y0, x1, y1):
+    return np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], dtype=np.float64)
+
+
+def star(n, r1, r2, cx=0.0, cy=0.0):
+    # Star with integer vertices, so that edge midpoints are exact
+    t = np.arange(2 * n) * np.pi / n
+    r = np.where(np.arange(2 * n) % 2 == 0, r1, r2)
+    return np.round(np.column_stack([cx + r * np.cos(t), cy + r * np.sin(t)]))
+
+
+def store(geometries):
+    # Layer from geometries given as lists of rings
+    return PolygonStore.from_records(
+        (np.concatenate(rings), np.cumsum([0] + [len(ring) for ring in rings]).astype(np.int64))
+        for rings in geometries)
+
+
+# Square with a hole, two parts with a hole in the second one, a star
+# overlapping both and a square sharing an edge with the first one
+LAYER = [
+    [square(0, 0, 10, 10), square(3, 3, 7, 7)],
+    [square(20, 0, 25, 5), square(30, 0, 40, 10), square(33, 3, 37, 7)],
+    [star(7, 12, 4, 15, 5)],
+    [square(10, 0, 14, 10)],
+]
+
+# Ring winding twice around its center, inside by winding number only
+t = (np.arange(5) * 4 * np.pi / 5) + np.pi / 2
+PENTAGRAM = np.round(np.column_stack([60 + 10 * np.cos(t), 5 + 10 * np.sin(t)]))
+
+METHODS = {"rc": "ray_crossing", "wn": "winding_number", "wi": "winding_number_int"}
+
+
+def sample_points(layer, seed=0):
+    # Random points with vertices, edge midpoints and points at vertex y
+    coords = layer.coords[:layer.ring_offsets[-1]]
+    x_min, y_min = coords.min(axis=0) - 1
+    x_max, y_max = coords.max(axis=0) + 1
+    rng = np.random.default_rng(seed)
+    random = np.column_stack([rng.uniform(x_min, x_max, 200), rng.uniform(y_min, y_max, 200)])
+    rings = np.split(coords, layer.ring_offsets[1:-1])
+    midpoints = np.concatenate([(ring + np.roll(ring, -1, axis=0)) / 2 for ring in rings])
+    vertex_y = np.column_stack([rng.uniform(x_min, x_max, len(coords)), coords[:, 1]])
+    return np.concatenate([random, coords, midpoints, vertex_y])
+
+
+def reference_positions(points, layer, method):
+    # Position of every point against every polygon by the reference algorithm
+    alg = Algorithms()
+    test = getattr(alg, METHODS[method])
+    result = np.zeros((len(points), len(layer)), dtype=np.int8)
+    for i in range(len(layer)):
+        xy, rings = layer.geometry(i)
+        polygons = [QPolygonF([QPointF(x, y) for x, y in xy[a:b]]) for a, b in zip(rings[:-1], rings[1:])]
+        for k, (x, y) in enumerate(points):
+            result[k, i] = alg.rings_position(QPointF(x, y), polygons, test)
+    return result
+
+
+def brute_force(points, layer, method="rc"):
+    """
+    Index, status and sharing count as in SweepJoin.join, from the
+    reference position against every polygon
+    """
+    positions = reference_positions(points, layer, method)
+    inside = positions == 1
+    boundary = positions == -1
+    status = np.where(inside.any(axis=1), 1, np.where(boundary.any(axis=1), -1, 0))
+    index = np.where(inside.any(axis=1), inside.argmax(axis=1),
+                     np.where(boundary.any(axis=1), boundary.argmax(axis=1), -1))
+    shared = np.where(status == -1, boundary.sum(axis=1), 0)
+    return index, status, shared
+
+
+@pytest.mark.parametrize("band_points", [1, 7, 512])
+def test_sweep_matches_classify_and_brute_force(band_points):
+    layer = store(LAYER)
+    points = sample_points(layer)
+    index, status, shared = brute_force(points, layer)
+
+    vec_index, vec_status = VectorAlgorithms().classify_points(points, layer, method="rc")
+    sweep_index, sweep_status, sweep_shared = sweep_join(points, layer, band_points)
+
+    assert (status == -1).any() and (status == 1).any() and (status == 0).any()
+    np.testing.assert_array_equal(vec_status, status)
+    np.testing.assert_array_equal(sweep_status, status)
+    np.testing.assert_array_equal(vec_index, index)
+    np.testing.assert_array_equal(sweep_index, index)
+    np.testing.assert_array_equal(sweep_shared, shared)
+
+
+def test_sweep_star_vertices():
+    layer = store([[star(50, 100, 20)]])
+    points = sample_points(layer, seed=1)
+    _, status, _ = brute_force(points, layer)
+    _, sweep_status, _ = sweep_join(points, layer, band_points=16)
+    np.testing.assert_array_equal(sweep_status, status)
+
+
+@pytest.mark.parametrize("noded", [False, True])
+def test_topology_t_junction(noded):
+    # Vertex 2, 1 of the right squares lies inside an edge of the left one
+    # unless the left one has a vertex there too
+    left = square(0, 0, 2, 2)
+    if noded:
+        left = np.insert(left, 2, [2, 1], axis=0)
+    layer = store([[left], [square(2, 0, 3, 1)], [square(2, 1, 3, 2)]])
+    topology = TopologyIndex(layer)
+
+    assert topology.clean == noded
+    shared = topology.sharing(1, (2.0, 1.0))
+    assert sorted(shared.tolist()) == ([0, 1, 2] if noded else [1, 2])
+
+    # Edge shared only when noded, and a point off the boundary
+    assert sorted(topology.sharing(1, (2.0, 0.5)).tolist()) == ([0, 1] if noded else [1])
+    assert topology.sharing(1, (2.5, 0.5)) is None
+
+    # Sweep counts all polygons touching the point either way
+    _, status, count = sweep_join(np.array([[2.0, 1.0]]), layer)
+    assert status[0] == -1 and count[0] == 3
+
+
+@pytest.mark.parametrize("method", ["rc", "wn", "wi"])
+def test_holes_and_parts(method):
+    layer = store(LAYER[:2] + [[PENTAGRAM]])
+    expected = {
+        (1, 1): 1, (5, 5): 0, (3, 5): -1, (7, 7): -1, (0, 5): -1,
+        (22, 2): 1, (27, 2): 0, (35, 5): 0, (31, 5): 1, (33, 5): -1, (45, 5): 0,
+        (60, 5): 1 if method == "wi" else 0,
+    }
+    points = np.array(list(expected), dtype=np.float64)
+    status = np.array(list(expected.values()))
+
+    reference = reference_positions(points, layer, method)
+    np.testing.assert_array_equal(np.where((reference == 1).any(axis=1), 1, reference.min(axis=1)), status)
+
+    vec = VectorAlgorithms()
+    _, vec_status = vec.classify_points(points, layer, method=method)
+    _, prep_status = vec.classify_points(points, layer, method=method, prepared=prepare_polygons(layer, threshold=1))
+    np.testing.assert_array_equal(vec_status, status)
+    np.testing.assert_array_equal(prep_status, status)
+
+    # Same results over all points of the layer
+    points = sample_points(layer, seed=2)
+    reference = reference_positions(points, layer, method)
+    status = np.where((reference == 1).any(axis=1), 1, reference.min(axis=1))
+    _, vec_status = vec.classify_points(points, layer, method=method)
+    _, prep_status = vec.classify_points(points, layer, method=method, prepared=prepare_polygons(layer, threshold=1))
+    np.testing.assert_array_equal(vec_status, status)
+    np.testing.assert_array_equal(prep_status, status)
@@ -0,0 +1,266 @@
+import numpy as np
+
+from querystats import QueryStats
+from sweep import SweepJoin
+from vectorized import BLOCK_SIZE, ring_ends
+
+
+def number_runs(order, changed):
+    """
+    Ids of items sorted by order, equal neighbours in order share an id,
+    changed tells whether item differs from the previous one
+    """
+    ids = np.empty(len(order), dtype=np.int64)
+    if len(order):
+        ids[order] = np.cumsum(np.concatenate([[True], changed])) - 1
+    return ids
+
+
+def orientation(ax, ay, bx, by, cx, cy):
+    # Side of c from line a b, 1 left, -1 right, 0 collinear
+    return np.sign((bx - ax)*(cy - ay) - (by - ay)*(cx - ax))
+
+
+def on_segment(ax, ay, bx, by, cx, cy, side):
+    # Collinear point c inside segment a b, end points excluded
+    return ((side == 0) & ~((cx == ax) & (cy == ay)) & ~((cx == bx) & (cy == by))
+            & (np.minimum(ax, bx) <= cx) & (cx <= np.maximum(ax, bx))
+            & (np.minimum(ay, by) <= cy) & (cy <= np.maximum(ay, by)))
+
+
+def edges_touch(x1, y1, x2, y2, owner):
+    """
+    Whether an edge crosses or touches an edge of another polygon anywhere
+    but at their common end points
+
+    Edges are registered in the cells of a grid with about one edge per
+    cell, and only edges of different polygons sharing a cell are tested.
+    """
+    n = len(x1)
+    if n == 0:
+        return False
+
+    # Cell size of a typical edge, at most 4096 cells per side
+    x_min = min(x1.min(), x2.min())
+    y_min = min(y1.min(), y2.min())
+    extent = max(max(x1.max(), x2.max()) - x_min, max(y1.max(), y2.max()) - y_min)
+    size = np.maximum(np.abs(x2 - x1), np.abs(y2 - y1))
+    cell = max(float(np.median(size)), extent / 4096) or 1.0
+    stride = int(extent // cell) + 2
+
+    # Cells covered by min-max box of every edge
+    ix0 = ((np.minimum(x1, x2) - x_min) // cell).astype(np.int64)
+    iy0 = ((np.minimum(y1, y2) - y_min) // cell).astype(np.int64)
+    w = ((np.maximum(x1, x2) - x_min) // cell).astype(np.int64) - ix0 + 1
+    h = ((np.maximum(y1, y2) - y_min) // cell).astype(np.int64) - iy0 + 1
+    counts = w * h
+    edge = np.repeat(np.arange(n), counts)
+    k = np.arange(len(edge)) - np.repeat(np.cumsum(counts) - counts, counts)
+    key = (iy0[edge] + k // w[edge]) * stride + ix0[edge] + k % w[edge]
+
+    # Registrations by cell and polygon, every edge pairs with the edges of
+    # later polygons of its cell
+    order = np.lexsort((owner[edge], key))
+    edge = edge[order]
+    key = key[order]
+    group = np.concatenate([[True], (key[1:] != key[:-1]) | (owner[edge[1:]] != owner[edge[:-1]])])
+    cell_end = np.append(np.flatnonzero(key[1:] != key[:-1]) + 1, len(key))
+    group_end = np.append(np.flatnonzero(group[1:]) + 1, len(key))
+    cell_end = cell_end[np.searchsorted(cell_end, np.arange(len(key)), side="right")]
+    group_end = group_end[np.searchsorted(group_end, np.arange(len(key)), side="right")]
+    partners = cell_end - group_end
+
+    # Test pairs in blocks
+    ends = np.cumsum(partners)
+    s = 0
+    while s < len(key):
+        e = max(s + 1, int(np.searchsorted(ends, ends[s] - partners[s] + BLOCK_SIZE, side="right")))
+        pairs = partners[s:e]
+        a = np.repeat(edge[s:e], pairs)
+        j = np.repeat(group_end[s:e] - np.cumsum(pairs) + pairs, pairs) + np.arange(int(pairs.sum()))
+        b = edge[j]
+
+        ax1, ay1, ax2, ay2 = x1[a], y1[a], x2[a], y2[a]
+        bx1, by1, bx2, by2 = x1[b], y1[b], x2[b], y2[b]
+        o1 = orientation(ax1, ay1, ax2, ay2, bx1, by1)
+        o2 = orientation(ax1, ay1, ax2, ay2, bx2, by2)
+        o3 = orientation(bx1, by1, bx2, by2, ax1, ay1)
+        o4 = orientation(bx1, by1, bx2, by2, ax2, ay2)
+
+        # Proper crossing or end point of one edge inside the other one
+        if np.any(((o1 * o2 < 0) & (o3 * o4 < 0))
+                  | on_segment(ax1, ay1, ax2, ay2, bx1, by1, o1) | on_segment(ax1, ay1, ax2, ay2, bx2, by2, o2)
+                  | on_segment(bx1, by1, bx2, by2, ax1, ay1, o3) | on_segment(bx1, by1, bx2, by2, ax2, ay2, o4)):
+            return True
+        s = e
+
+    return False
+
+
+class TopologyIndex:
+    """
+    Polygons owning every vertex and undirected edge of a polygon layer
+
+    Vertices with identical coordinates get one id, edges are identified by
+    the ids of their end points regardless of direction. Owners of vertex v
+    are vertex_owners[vertex_offsets[v]:vertex_offsets[v + 1]], edges are
+    stored the same way. Adjacent polygons share vertices and edges
+    exactly, so polygons whose boundary holds a point found on the boundary
+    of one of them need not be tested again.
+
+    clean tells whether the layer is exactly noded and free of overlaps,
+    edges of different polygons meet only at common vertices and no edge
+    lies inside another polygon. Owners of the vertex or edge holding a
+    point are then all polygons touching it and no other polygon contains
+    it. Otherwise polygons touching the point without sharing the vertex or
+    edge, as at a vertex lying inside an edge of another polygon, are not
+    found this way.
+    """
+
+    def __init__(self, layer):
+        self.layer = layer
+        coords = np.ascontiguousarray(layer.coords[:layer.ring_offsets[-1]])
+        n = len(coords)
+
+        # Geometry owning every vertex
+        rings = np.repeat(np.arange(len(layer.ring_offsets) - 1), np.diff(layer.ring_offsets))
+        owner = np.repeat(np.arange(len(layer)), np.diff(layer.geom_offsets))[rings]
+
+        # Vertex ids, vertices with equal coordinates are adjacent in order
+        order = np.lexsort((coords[:, 1], coords[:, 0]))
+        self.vertex_ids = number_runs(order, np.any(coords[order[1:]] != coords[order[:-1]], axis=1))
+
+        # Edge from every vertex to the next one of its ring
+        nxt = np.arange(1, n + 1)
+        starts = layer.ring_offsets[:-1]
+        ends = layer.ring_offsets[1:]
+        filled = ends > starts
+        nxt[ends[filled] - 1] = starts[filled]
+
+        # Edge ids from sorted pairs of end point ids
+        a = self.vertex_ids
+        b = self.vertex_ids[nxt] if n else a
+        keys = np.minimum(a, b) * (n + 1) + np.maximum(a, b)
+        order = np.argsort(keys, kind="stable")
+        self.edge_ids = number_runs(order, keys[order[1:]] != keys[order[:-1]])
+
+        self.vertex_offsets, self.vertex_owners = self.owners(self.vertex_ids, owner)
+        self.edge_offsets, self.edge_owners = self.owners(self.edge_ids, owner)
+
+        x1 = coords[:, 0]
+        y1 = coords[:, 1]
+        x2 = x1[nxt] if n else x1
+        y2 = y1[nxt] if n else y1
+        self.clean = not edges_touch(x1, y1, x2, y2, owner) and not self.edges_covered(x1, y1, x2, y2)
+
+    # Arrays saved in geometry cache
+    ARRAYS = ("vertex_ids", "edge_ids", "vertex_offsets", "vertex_owners", "edge_offsets", "edge_owners")
+
+    @classmethod
+    def from_arrays(cls, layer, arrays, clean):
+        """
+        Index of layer from arrays of an index built earlier, arrays may be
+        a function returning them, called on first use, or None when they
+        turn out to be unusable
+        """
+        topology = cls.__new__(cls)
+        topology.layer = layer
+        topology.clean = clean
+        if callable(arrays):
+            topology.load = arrays
+        else:
+            topology.set_arrays(arrays)
+        return topology
+
+    def set_arrays(self, arrays):
+        # Without arrays no point is found on shared vertices or edges
+        if arrays is None:
+            self.clean = False
+        for name in self.ARRAYS:
+            setattr(self, name, None if arrays is None else arrays[name])
+
+    def __getattr__(self, name):
+        # Arrays of from_arrays are loaded when first needed
+        if name in self.ARRAYS and "load" in self.__dict__:
+            self.set_arrays(self.__dict__.pop("load")())
+            return getattr(self, name)
+        raise AttributeError(name)
+
+    def arrays(self):
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    def edges_covered(self, x1, y1, x2, y2):
+        """
+        Whether the midpoint of an edge lies inside or on the boundary of a
+        polygon not owning the edge
+
+        Edges of a noded layer meet other polygons only at common vertices,
+        so an edge inside another polygon has its midpoint inside it.
+        """
+        n_polygons = len(self.layer)
+        if len(x1) == 0:
+            return False
+
+        # One edge of every edge id, edges of repeated vertices are points
+        # and touch the polygons sharing the vertex
+        first = np.empty(int(self.edge_ids.max()) + 1, dtype=np.int64)
+        first[self.edge_ids[::-1]] = np.arange(len(x1))[::-1]
+        first = first[(x1[first] != x2[first]) | (y1[first] != y2[first])]
+        mid = np.column_stack([(x1[first] + x2[first]) / 2, (y1[first] + y2[first]) / 2])
+
+        # Owner pairs encoded in one integer, sorted
+        owned = np.repeat(np.arange(len(self.edge_offsets) - 1), np.diff(self.edge_offsets)) * n_polygons + self.edge_owners
+
+        for point, polygon, status in SweepJoin(self.layer).positions(mid, QueryStats("rc", "sweep")):
+            keys = self.edge_ids[first[point[status != 0]]] * n_polygons + polygon[status != 0]
+            pos = np.minimum(np.searchsorted(owned, keys), len(owned) - 1)
+            if np.any(owned[pos] != keys):
+                return True
+        return False
+
+    @staticmethod
+    def owners(ids, owner):
+        # Offsets and sorted distinct owners of every id
+        if len(ids) == 0:
+            return np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        # Distinct id and owner pairs encoded in one integer, sorted by id
+        n_owners = int(owner.max()) + 1
+        pairs = np.sort(ids * n_owners + owner)
+        pairs = pairs[np.concatenate([[True], pairs[1:] != pairs[:-1]])]
+        offsets = np.zeros(int(ids.max()) + 2, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(pairs // n_owners, minlength=len(offsets) - 1))
+        return offsets, pairs % n_owners
+
+    def sharing(self, i, q):
+        """
+        Polygons whose boundary shares the vertex or edge of polygon i which
+        holds point q, None if no vertex or edge of polygon i holds q exactly
+        """
+        if self.vertex_ids is None:
+            return None
+
+        qx, qy = q
+        layer = self.layer
+        start = int(layer.ring_offsets[layer.geom_offsets[i]])
+        xy, rings = layer.geometry(i)
+        x1 = xy[:, 0]
+        y1 = xy[:, 1]
+
+        # Point is a vertex
+        hit = np.flatnonzero((x1 == qx) & (y1 == qy))
+        if len(hit):
+            v = self.vertex_ids[start + hit[0]]
+            return self.vertex_owners[self.vertex_offsets[v]:self.vertex_offsets[v + 1]]
+
+        # Point is collinear with edge and inside its min-max box
+        x2, y2 = ring_ends(x1, y1, rings)
+        det = (x2 - x1)*(qy - y1) - (y2 - y1)*(qx - x1)
+        hit = np.flatnonzero((det == 0)
+                             & (np.minimum(x1, x2) <= qx) & (qx <= np.maximum(x1, x2))
+                             & (np.minimum(y1, y2) <= qy) & (qy <= np.maximum(y1, y2)))
+        if len(hit):
+            e = self.edge_ids[start + hit[0]]
+            return self.edge_owners[self.edge_offsets[e]:self.edge_offsets[e + 1]]
+
+        return None
@@ -0,0 +1,353 @@
+import numpy as np
+from math import pi
+from time import perf_counter
+
+from polygonstore import PolygonStore
+from querystats import QueryStats
+
+
+# Maximal number of point-edge pairs evaluated at once in batch mode
+BLOCK_SIZE = 1 << 20
+
+
+def ring_ends(x, y, rings=None):
+    """
+    Second vertex of every edge, each ring closes to its own first vertex
+
+    rings are offsets of rings into x, y ending with their length, None for
+    a single ring.
+    """
+    if rings is None or len(rings) <= 2:
+        return np.roll(x, -1), np.roll(y, -1)
+
+    # Next vertex, last vertex of a ring wraps to the ring start
+    nxt = np.arange(1, len(x) + 1)
+    starts = rings[:-1]
+    ends = rings[1:]
+    filled = ends > starts
+    nxt[ends[filled] - 1] = starts[filled]
+    return x[nxt], y[nxt]
+
+
+class VectorAlgorithms:
+    """
+    Point and polygon position over array-backed polygons
+
+    Polygons are contiguous float64 arrays of shape (n, 2) and query points
+    are (x, y) pairs. Optional ring offsets split the vertices into rings,
+    which are evaluated together, so holes and parts of multipolygons are
+    handled in one pass. Return codes match Algorithms: 1 inside, 0 outside,
+    -1 on the boundary.
+    """
+
+    def __init__(self):
+        pass
+
+    def polygon_to_array(self, pol):
+        # Convert sequence of points with x(), y() methods to (n, 2) array
+        return np.array([(p.x(), p.y()) for p in pol], dtype=np.float64).reshape(-1, 2)
+
+    def ray_crossing(self, q, xy, rings=None):
+        # Analyze point and polygon position using ray crossing algorithm
+        if len(xy) == 0:
+            return 0
+
+        # Reduce coordinates to q
+        p1x = xy[:, 0] - q[0]
+        p1y = xy[:, 1] - q[1]
+
+        # Point is on vertex
+        if np.any((p1x == 0) & (p1y == 0)):
+            return -1
+
+        # Second vertex of every edge
+        p2x, p2y = ring_ends(p1x, p1y, rings)
+
+        # Lower and upper segments crossing the ray
+        lower = (p2y < 0) != (p1y < 0)
+        upper = (p2y > 0) != (p1y > 0)
+        cross = lower | upper
+
+        # Compute intersection x coordinate only for crossing edges
+        xm = np.zeros_like(p1x)
+        xm[cross] = (p2x[cross]*p1y[cross] - p1x[cross]*p2y[cross])/(p2y[cross] - p1y[cross])
+
+        kl = np.count_nonzero(lower & (xm < 0))
+        kr = np.count_nonzero(upper & (xm > 0))
+
+        # Point is on the edge
+        if (kl % 2) != (kr % 2):
+            return -1
+
+        # Point is inside
+        if kr % 2 == 1:
+            return 1
+
+        # Point is outside
+        return 0
+
+    def winding_number(self, q, xy, rings=None):
+        # Analyze point and polygon position using winding number algorithm
+        if len(xy) == 0:
+            return 0
+
+        # Small variance to compare floating point number
+        e = 1e-9
+
+        qx, qy = q
+        x1 = xy[:, 0]
+        y1 = xy[:, 1]
+
+        # Point is on vertex
+        if np.any((x1 == qx) & (y1 == qy)):
+            return -1
+
+        x2, y2 = ring_ends(x1, y1, rings)
+
+        # Half-plane test
+        det = (x2 - x1)*(qy - y1) - (y2 - y1)*(qx - x1)
+
+        # Angles between edge end points seen from q
+        v1x = x1 - qx
+        v1y = y1 - qy
+        v2x = x2 - qx
+        v2y = y2 - qy
+        norms = np.sqrt(v1x**2 + v1y**2)*np.sqrt(v2x**2 + v2y**2)
+        omega = np.arccos(np.clip((v1x*v2x + v1y*v2y)/norms, -1, 1))
+
+        # Point lies on the edge
+        collinear = det == 0
+        if np.any(collinear & (omega <= pi + e) & (omega >= pi - e)):
+            return -1
+
+        # Sum angles signed by half-plane, collinear edges contribute 0
+        omega_sum = omega[det > 0].sum() - omega[det < 0].sum()
+
+        if abs(omega_sum) <= 2*pi + e and abs(omega_sum) >= 2*pi - e:
+            # Point is inside
+            return 1
+
+        # Point is outside
+        return 0
+
+    def winding_number_int(self, q, xy, rings=None):
+        # Analyze point and polygon position using integer winding number
+        return int(self.winding_number_int_points(np.array([q[0]], dtype=np.float64), np.array([q[1]], dtype=np.float64), xy, rings)[0])
+
+    def ray_crossing_points(self, px, py, xy, rings=None):
+        # Ray crossing for many points against one polygon, returns codes
+        result = np.zeros(len(px), dtype=np.int8)
+        if len(xy) == 0 or len(px) == 0:
+            return result
+
+        x1 = xy[:, 0]
+        y1 = xy[:, 1]
+        x2, y2 = ring_ends(x1, y1, rings)
+
+        # Process points in blocks to bound memory of point-edge matrices
+        step = max(1, BLOCK_SIZE // len(xy))
+        for s in range(0, len(px), step):
+            qx = px[s:s + step, None]
+            qy = py[s:s + step, None]
+
+            # Reduce coordinates to points, one row per point
+            p1x = x1 - qx
+            p1y = y1 - qy
+            p2x = x2 - qx
+            p2y = y2 - qy
+
+            on_vertex = np.any((p1x == 0) & (p1y == 0), axis=1)
+
+            lower = (p2y < 0) != (p1y < 0)
+            upper = (p2y > 0) != (p1y > 0)
+            cross = lower | upper
+
+            # Intersection x coordinate of crossing edges
+            xm = np.divide(p2x*p1y - p1x*p2y, p2y - p1y, out=np.zeros_like(p1x), where=cross)
+
+            kl = np.count_nonzero(lower & (xm < 0), axis=1)
+            kr = np.count_nonzero(upper & (xm > 0), axis=1)
+
+            block = np.where(kr % 2 == 1, 1, 0)
+            block[(kl % 2) != (kr % 2)] = -1
+            block[on_vertex] = -1
+            result[s:s + step] = block
+
+        return result
+
+    def winding_number_points(self, px, py, xy, rings=None):
+        # Winding number for many points against one polygon, returns codes
+        result = np.zeros(len(px), dtype=np.int8)
+        if len(xy) == 0 or len(px) == 0:
+            return result
+
+        e = 1e-9
+        x1 = xy[:, 0]
+        y1 = xy[:, 1]
+        x2, y2 = ring_ends(x1, y1, rings)
+
+        step = max(1, BLOCK_SIZE // len(xy))
+        for s in range(0, len(px), step):
+            qx = px[s:s + step, None]
+            qy = py[s:s + step, None]
+
+            v1x = x1 - qx
+            v1y = y1 - qy
+            v2x = x2 - qx
+            v2y = y2 - qy
+
+            on_vertex = np.any((v1x == 0) & (v1y == 0), axis=1)
+
+            # Half-plane test
+            det = (x2 - x1)*(qy - y1) - (y2 - y1)*(qx - x1)
+
+            # Angles between edge end points, 0 for degenerate vectors
+            norms = np.sqrt(v1x**2 + v1y**2)*np.sqrt(v2x**2 + v2y**2)
+            cos = np.divide(v1x*v2x + v1y*v2y, norms, out=np.ones_like(norms), where=norms != 0)
+            omega = np.arccos(np.clip(cos, -1, 1))
+
+            on_edge = np.any((det == 0) & (omega <= pi + e) & (omega >= pi - e), axis=1)
+
+            omega_sum = np.abs((omega*np.sign(det)).sum(axis=1))
+
+            block = np.where((omega_sum <= 2*pi + e) & (omega_sum >= 2*pi - e), 1, 0)
+            block[on_vertex | on_edge] = -1
+            result[s:s + step] = block
+
+        return result
+
+    def winding_number_int_points(self, px, py, xy, rings=None):
+        # Integer winding number for many points against one polygon
+        result = np.zeros(len(px), dtype=np.int8)
+        if len(xy) == 0 or len(px) == 0:
+            return result
+
+        x1 = xy[:, 0]
+        y1 = xy[:, 1]
+        x2, y2 = ring_ends(x1, y1, rings)
+
+        # First edge of every ring with vertices
+        firsts = np.zeros(1, dtype=np.int64) if rings is None else rings[:-1][rings[1:] > rings[:-1]]
+
+        step = max(1, BLOCK_SIZE // len(xy))
+        for s in range(0, len(px), step):
+            qx = px[s:s + step, None]
+            qy = py[s:s + step, None]
+
+            on_vertex = np.any((x1 == qx) & (y1 == qy), axis=1)
+
+            # Half-plane test
+            det = (x2 - x1)*(qy - y1) - (y2 - y1)*(qx - x1)
+
+            # Collinear with edge and inside its min-max box
+            on_edge = np.any((det == 0)
+                             & (np.minimum(x1, x2) <= qx) & (qx <= np.maximum(x1, x2))
+                             & (np.minimum(y1, y2) <= qy) & (qy <= np.maximum(y1, y2)), axis=1)
+
+            # Signed crossings of upward and downward edges
+            up = (y1 <= qy) & (y2 > qy) & (det > 0)
+            down = (y1 > qy) & (y2 <= qy) & (det < 0)
+
+            # Nonzero winding of every ring, holes and parts by parity of rings
+            if len(firsts) == 1:
+                odd = np.count_nonzero(up, axis=1) != np.count_nonzero(down, axis=1)
+            else:
+                wn = np.add.reduceat(up.astype(np.int64) - down, firsts, axis=1)
+                odd = np.count_nonzero(wn, axis=1) % 2 == 1
+
+            block = np.where(odd, 1, 0)
+            block[on_vertex | on_edge] = -1
+            result[s:s + step] = block
+
+        return result
+
+    def classify_points(self, points, polygons, bounds=None, method="rc", prepared=None, stats=None):
+        """
+        Classify many points against a polygon layer
+
+        polygons is a list of (n, 2) arrays or a PolygonStore. Returns two
+        arrays: index of the containing polygon (first polygon whose
+        boundary holds the point, -1 outside all polygons) and status code
+        per point, 1 inside, 0 outside, -1 on the boundary. Polygons found in
+        prepared (index -> PreparedPolygon) are tested through their slabs
+        for ray crossing and integer winding number. Work counters and
+        filter and test times are added to stats if given.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        m = len(points)
+        if stats is None:
+            stats = QueryStats(method, "vectorized")
+        stats.points += m
+        start = perf_counter()
+
+        index = np.full(m, -1, dtype=np.int64)
+        status = np.zeros(m, dtype=np.int8)
+
+        if method == "rc":
+            test = self.ray_crossing_points
+        elif method == "wn":
+            test = self.winding_number_points
+        elif method == "wi":
+            test = self.winding_number_int_points
+        else:
+            raise ValueError(f"Unknown method: {method}")
+
+        # Sort points by x to find bounding box candidates by bisection
+        order = np.argsort(points[:, 0], kind="stable")
+        xs = points[order, 0]
+        ys = points[order, 1]
+
+        # Vertices and ring offsets of every polygon
+        if isinstance(polygons, PolygonStore):
+            geometries = (polygons.geometry(i) for i in range(len(polygons)))
+            if bounds is None:
+                bounds = polygons.bounds
+        else:
+            geometries = ((xy, None) for xy in polygons)
+
+        for i, (xy, rings) in enumerate(geometries):
+            if len(xy) == 0:
+                continue
+            stats.polygons += 1
+
+            if bounds is None:
+                x_min, y_min = xy.min(axis=0)
+                x_max, y_max = xy.max(axis=0)
+            else:
+                x_min, y_min, x_max, y_max = bounds[i]
+
+            # Points inside polygon min-max box
+            lo = np.searchsorted(xs, x_min, side="left")
+            hi = np.searchsorted(xs, x_max, side="right")
+            in_bb = np.nonzero((ys[lo:hi] >= y_min) & (ys[lo:hi] <= y_max))[0] + lo
+            cand = order[in_bb]
+
+            # Points found inside an earlier polygon are final
+            cand = cand[status[cand] != 1]
+            start = stats.lap("filter", start)
+            if len(cand) == 0:
+                continue
+            stats.in_box += len(cand)
+
+            prep = prepared.get(i) if prepared else None
+            if prep is not None and method == "rc":
+                res = prep.ray_crossing_points(points[cand, 0], points[cand, 1])
+                stats.edges += prep.slab_edges_points(points[cand, 1])
+            elif prep is not None and method == "wi":
+                res = prep.winding_number_int_points(points[cand, 0], points[cand, 1])
+                stats.edges += prep.slab_edges_points(points[cand, 1])
+            else:
+                res = test(points[cand, 0], points[cand, 1], xy, rings)
+                stats.edges += len(cand) * len(xy)
+            start = stats.lap("test", start)
+
+            inside = cand[res == 1]
+            index[inside] = i
+            status[inside] = 1
+
+            # Keep first polygon sharing the boundary
+            boundary = cand[(res == -1) & (status[cand] == 0)]
+            index[boundary] = i
+            status[boundary] = -1
+
+        return index, status